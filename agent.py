@@ -1,10 +1,9 @@
 # agent.py
 
 import asyncio
-import yaml
+from core.config import get_profile
 from core.loop import AgentLoop
-from core.session import MultiMCP
-from core.context import MemoryItem, AgentContext
+from core.runtime import AgentRuntime, read_in_thread
 import datetime
 from pathlib import Path
 import json
@@ -19,23 +18,15 @@ async def main():
     print("🧠 Cortex-R Agent Ready")
     current_session = None
 
-    with open("config/profiles.yaml", "r") as f:
-        profile = yaml.safe_load(f)
-        mcp_servers_list = profile.get("mcp_servers", [])
-        # What does get do here? 
-        # It retrieves the value associated with the key "mcp_servers" from the profile dictionary.
-        mcp_servers = {server["id"]: server for server in mcp_servers_list}
-        # Sample output of mcp_servers?
-        # { "server1": {"id": "server1", "description": "This server handles data processing"}, "server2": {"id": "server2", "description": "This server manages user authentication"} }
-
-    multi_mcp = MultiMCP(server_configs=list(mcp_servers.values()))
-    # Initialize the MultiMCP with the list of server configurations extracted from the profile.
-    await multi_mcp.initialize()
+    # MCP servers, tool index, plan cache, sandbox pool and server router, shared by every session
+    runtime = AgentRuntime(get_profile())
+    await runtime.start()
 
     try:
         while True: # When would this be false? -> This loop will continue indefinitely until it is explicitly broken out of, such as when the user types 'exit'.
             # Does control + C break this loop? -> Yes, pressing Control + C raises a KeyboardInterrupt exception, which is caught in the except block, allowing the program to exit gracefully.
-            user_input = input("🧑 What do you want to solve today? (type 'exit' to close or 'new' to start afresh) → ")
+            # Read on a side thread: input() would otherwise freeze the event loop and any background MCP work
+            user_input = await read_in_thread(lambda: input("🧑 What do you want to solve today? (type 'exit' to close or 'new' to start afresh) → "))
             if user_input.lower() == 'exit':
                 break
             if user_input.lower() == 'new':
@@ -44,11 +35,9 @@ async def main():
                 continue
 
             while True: # When would this be false? -> This inner loop will continue until a final answer is obtained or further processing is no longer required.
-                context = AgentContext(
+                context = runtime.new_context(
                     user_input=user_input, # Example: "What is the capital of France?"
                     session_id=current_session, # Example: "2024/06/15/session-1712345678-abc123"
-                    dispatcher=multi_mcp, # Passing the initialized MultiMCP dispatcher to the AgentContext.
-                    mcp_server_descriptions=mcp_servers, # Passing MCP parameters to the AgentContext. Not just descriptions, right? -> Correct, it passes the entire server configuration, which may include more than just descriptions.
                 )
                 agent = AgentLoop(context) # What does agen contain? Example? -> The agent variable contains an instance of the AgentLoop class, which is initialized with the current AgentContext. This instance will manage the interaction loop for processing the user's input and generating responses.
                 if not current_session: # If no current session exists, set it.
@@ -76,8 +65,10 @@ async def main():
                     print(f"\n💡 Final Answer (unexpected): {result}")
                     # When would this happen? -> This would happen if the result returned by agent.run() is not a dictionary, which could occur due to an unexpected error or if the agent's logic produces a different type of output.
                     break
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):  # Ctrl+C while waiting for input arrives as a cancellation
         print("\n👋 Received exit signal. Shutting down...")
+    finally:
+        await runtime.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,81 @@
+# core/catalog.py
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Optional, Any, List, Dict
+from mcp.types import Tool
+
+DEFAULT_CATALOG_PATH = "cache/tool_catalog.json"
+
+
+class ToolCatalog:
+    """
+    On-disk cache of each MCP server's list_tools() output.
+    Entries are keyed by server id and validated against a fingerprint of the
+    server script contents and its cwd, so an unchanged server is never spawned
+    just to rediscover its tools.
+    """
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty = False
+
+    def load(self):
+        try:
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)  # atomic, so a crash never leaves half a catalog
+        self.dirty = False
+
+    @staticmethod
+    def fingerprint(config: dict) -> Optional[str]:
+        """
+        Hash of the server script, the *.py modules next to it (its local imports, e.g. the
+        models.py its tool schemas come from) and its cwd; None if the script cannot be read.
+        """
+        cwd = config.get("cwd", os.getcwd())
+        script = Path(cwd) / config["script"]
+        try:
+            content = script.read_bytes()
+        except OSError:
+            return None
+        digest = hashlib.sha256()
+        digest.update(str(Path(cwd).resolve()).encode("utf-8"))
+        digest.update(config["script"].encode("utf-8"))
+        digest.update(content)
+        for module in sorted(script.parent.glob("*.py")):
+            if module.name == script.name:
+                continue
+            try:
+                module_content = module.read_bytes()
+            except OSError:
+                continue
+            digest.update(module.name.encode("utf-8"))
+            digest.update(hashlib.sha256(module_content).digest())
+        return digest.hexdigest()
+
+    def get(self, server_id: str, fingerprint: Optional[str]) -> Optional[List[Tool]]:
+        entry = self.entries.get(server_id)
+        if not fingerprint or not entry or entry.get("fingerprint") != fingerprint:
+            return None
+        return [Tool.model_validate(tool) for tool in entry["tools"]]
+
+    def put(self, server_id: str, fingerprint: Optional[str], tools: List[Tool]):
+        if not fingerprint:
+            return
+        self.entries[server_id] = {
+            "fingerprint": fingerprint,
+            "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in tools],
+        }
+        self.dirty = True
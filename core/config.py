@@ -0,0 +1,48 @@
+# core/config.py
+
+import os
+import json
+import yaml
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+MODELS_JSON = ROOT / "config" / "models.json"
+
+
+class ConfigRegistry:
+    """
+    Process-wide cache of parsed config files.
+    Each file is parsed once and re-parsed only when its mtime changes, so callers can
+    ask for the config on every use and still pick up edits without a restart.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Path, Tuple[float, Any]] = {}  # path → (mtime, parsed data)
+        self._lock = threading.Lock()
+
+    def load(self, path: Path, parser: Callable[[str], Any]) -> Any:
+        path = Path(path)
+        mtime = os.stat(path).st_mtime
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+        with self._lock:
+            data = parser(path.read_text(encoding="utf-8"))
+            self._entries[path] = (mtime, data)
+        return data
+
+
+registry = ConfigRegistry()
+
+
+def get_profile() -> Dict[str, Any]:
+    """Parsed config/profiles.yaml (shared; treat as read-only)."""
+    return registry.load(PROFILE_YAML, yaml.safe_load)
+
+
+def get_models_config() -> Dict[str, Any]:
+    """Parsed config/models.json (shared; treat as read-only)."""
+    return registry.load(MODELS_JSON, json.loads)
@@ -1,10 +1,9 @@
 # core/context.py
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
 from modules.memory import MemoryManager, MemoryItem
 from core.session import MultiMCP  # For dispatcher typing
-from pathlib import Path
-import yaml
+from core.config import get_profile
 import time
 import uuid
 from datetime import datetime
@@ -20,8 +19,7 @@ class StrategyProfile(BaseModel):
 
 class AgentProfile:
     def __init__(self):
-        with open("config/profiles.yaml", "r") as f:
-            config = yaml.safe_load(f)
+        config = get_profile()  # parsed once per process, re-parsed only when the file changes
 
         self.name = config["agent"]["name"]
         self.id = config["agent"]["id"]
@@ -45,6 +43,11 @@ class AgentContext:
         session_id: Optional[str] = None,
         dispatcher: Optional[MultiMCP] = None,
         mcp_server_descriptions: Optional[List[Any]] = None,
+        tool_index: Optional[Any] = None,
+        server_router: Optional[Any] = None,
+        plan_cache: Optional[Any] = None,
+        sandbox_pool: Optional[Any] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
     ):
         if session_id is None:
             today = datetime.now()
@@ -58,6 +61,11 @@ class AgentContext:
         self.session_id = self.memory.session_id
         self.dispatcher = dispatcher  # 🆕 Added formally
         self.mcp_server_descriptions = mcp_server_descriptions  # 🆕 Added formally
+        self.tool_index = tool_index  # ToolIndex shared across sessions; None keeps every selected tool
+        self.server_router = server_router  # ServerRouter fast path for perception; None always asks the LLM
+        self.plan_cache = plan_cache  # PlanCache of solve() programs reusable across similar queries
+        self.sandbox_pool = sandbox_pool  # SandboxPool of worker processes; None runs plans in-process
+        self.on_progress = on_progress  # receives progress events (service mode); None for the REPL
         self.step = 0
         self.task_progress = []  # 🆕 Will track tool executions
         self.final_answer = None
@@ -112,5 +120,14 @@ class AgentContext:
                 item["status"] = status
                 break
 
+    def report(self, event: str, **data):
+        """Send a progress event for this session to whoever started it, if anyone is listening."""
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress({"event": event, "session_id": self.session_id, "step": self.step + 1, **data})
+        except Exception as e:  # a client that went away must not fail the session
+            print(f"[context] progress listener failed: {e}")
+
     def __repr__(self):
         return f"<AgentContext step={self.step}, session_id={self.session_id}>"
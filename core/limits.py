@@ -0,0 +1,83 @@
+# core/limits.py
+
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional, Any, Dict
+
+
+class QueueFullError(RuntimeError):
+    """Raised immediately when a limiter's wait queue is full (backpressure)."""
+
+
+class ConcurrencyLimiter:
+    """
+    Caps concurrent calls to a server or tool.
+    Up to `max_concurrency` calls run at once; up to `max_queue` more wait asynchronously
+    for a slot, and anything beyond that is rejected without waiting.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: Optional[int] = None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self.max_queue is not None and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(
+                f"{self.name}: {self.running} calls running and {self.waiting} queued (max_queue={self.max_queue})"
+            )
+
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot_if_free(self):
+        """Take a slot only if one is free right now; yields False instead of queueing."""
+        if self._semaphore.locked():
+            yield False
+            return
+        await self._semaphore.acquire()  # free, so this returns without waiting
+        self.admitted += 1
+        self.running += 1
+        try:
+            yield True
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_wait_avg_ms": round(1000 * self.wait_total / self.admitted, 2) if self.admitted else 0.0,
+            "queue_wait_max_ms": round(1000 * self.wait_max, 2),
+        }
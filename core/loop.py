@@ -2,9 +2,10 @@
 
 import asyncio
 from modules.perception import run_perception
-from modules.decision import generate_plan
+from modules.decision import generate_plan, forget_plan
 from modules.action import run_python_sandbox
-from modules.model_manager import ModelManager
+from modules.plan_analysis import validate_plan
+from modules.model_manager import get_model_manager
 from core.session import MultiMCP
 from core.strategy import select_decision_prompt_path
 from core.context import AgentContext
@@ -19,11 +20,14 @@ except ImportError:
         now = datetime.datetime.now().strftime("%H:%M:%S")
         print(f"[{now}] [{stage}] {msg}")
 
+MAX_FORWARDS_PER_STEP = 3  # FURTHER_PROCESSING_REQUIRED hand-offs allowed before one costs a lifeline
+
+
 class AgentLoop:
     def __init__(self, context: AgentContext):
         self.context = context
         self.mcp = self.context.dispatcher
-        self.model = ModelManager()
+        self.model = get_model_manager()
 
     async def run(self):
         max_steps = self.context.agent_profile.strategy.max_steps
@@ -32,19 +36,35 @@ class AgentLoop:
             print(f"🔁 Step {step+1}/{max_steps} starting...")
             self.context.step = step
             lifelines_left = self.context.agent_profile.strategy.max_lifelines_per_step
+            perceptions = {}  # input text → PerceptionResult, for this step only
+            forwarded = set()  # intermediate results already handed back to the planner this step
 
             while lifelines_left >= 0:
                 # === Perception ===
+                # A lifeline retry re-plans only; perception reruns when the input changes
                 user_input_override = getattr(self.context, "user_input_override", None)
-                perception = await run_perception(context=self.context, user_input=user_input_override or self.context.user_input)
-
-                print(f"[perception] {perception}")
+                perception_input = user_input_override or self.context.user_input
+                perception = perceptions.get(perception_input)
+                if perception is None:
+                    perception = await run_perception(context=self.context, user_input=perception_input)
+                    perceptions[perception_input] = perception
+                    print(f"[perception] {perception}")
+                    self.context.report("perception", servers=perception.selected_servers, tags=perception.tags)
+                else:
+                    log("loop", "♻️ Reusing perception for unchanged input")
 
                 selected_servers = perception.selected_servers
+                self.mcp.warm_up(selected_servers)  # start selected servers while we plan
                 selected_tools = self.mcp.get_tools_from_servers(selected_servers)
                 if not selected_tools:
                     log("loop", "⚠️ No tools selected — aborting step.")
                     break
+                if self.context.tool_index:
+                    selected_tools = await self.context.tool_index.search(
+                        query=perception_input,
+                        tools=selected_tools,
+                        hint=perception.tool_hint,
+                    )
 
                 # === Planning ===
                 tool_descriptions = summarize_tools(selected_tools)
@@ -53,23 +73,56 @@ class AgentLoop:
                     exploration_mode=self.context.agent_profile.strategy.exploration_mode,
                 )
 
-                plan = await generate_plan(
-                    user_input=self.context.user_input,
+                # A solved query with the same shape and tool catalog skips the planning LLM
+                plan = None
+                first_attempt = lifelines_left == self.context.agent_profile.strategy.max_lifelines_per_step
+                plan_cache = self.context.plan_cache
+                if plan_cache and first_attempt and not user_input_override:
+                    plan = plan_cache.lookup(self.context.user_input)
+                plan_reused = plan is not None
+
+                plan = plan or await generate_plan(
+                    # After FURTHER_PROCESSING_REQUIRED the planner must see the forwarded result;
+                    # it also makes the prompt (and so the LLM cache key) differ from the last one
+                    user_input=perception_input,
                     perception=perception,
                     memory_items=self.context.memory.get_session_items(),
                     tool_descriptions=tool_descriptions,
                     prompt_path=prompt_path,
                     step_num=step + 1,
                     max_steps=max_steps,
+                    # A retry after a failed plan is cached under its own key, never the failed plan's
+                    attempt=self.context.agent_profile.strategy.max_lifelines_per_step - lifelines_left,
                 )
                 print(f"[plan] {plan}")
+                self.context.report("plan", plan=plan, reused=plan_reused)
 
                 # === Execution ===
                 if re.search(r"^\s*(async\s+)?def\s+solve\s*\(", plan, re.MULTILINE):
+                    # Static checks first: a plan naming a missing tool or malformed arguments
+                    # fails here, before any tool round trip
+                    problems = validate_plan(plan, self.mcp.tool_map)
+                    if problems:
+                        log("loop", f"⚠️ Plan rejected before execution: {problems}")
+                        self.context.report("plan_rejected", problems=problems)
+                        self.context.memory.add_tool_output(
+                            tool_name="solve_sandbox",
+                            tool_args={"plan": plan},
+                            tool_result={"result": f"[plan rejected: {'; '.join(problems)}]"},
+                            success=False,
+                            tags=["sandbox", "validation"],
+                        )
+                        if plan_reused:
+                            plan_cache.discard(self.context.user_input, plan)
+                        forget_plan(plan)
+                        lifelines_left -= 1
+                        continue
+
                     print("[loop] Detected solve() plan — running sandboxed...")
 
                     self.context.log_subtask(tool_name="solve_sandbox", status="pending")
-                    result = await run_python_sandbox(plan, dispatcher=self.mcp)
+                    result = await run_python_sandbox(plan, dispatcher=self.mcp, pool=self.context.sandbox_pool)
+                    self.context.report("result", result=str(result))
 
                     success = False
                     if isinstance(result, str):
@@ -85,9 +138,18 @@ class AgentLoop:
                                 success=True,
                                 tags=["sandbox"],
                             )
+                            await self._learn_from_success(perception, plan_reused)
                             return {"status": "done", "result": self.context.final_answer}
                         elif result.startswith("FURTHER_PROCESSING_REQUIRED:"):
                             content = result.split("FURTHER_PROCESSING_REQUIRED:")[1].strip()
+                            if content in forwarded or len(forwarded) >= MAX_FORWARDS_PER_STEP:
+                                # Same result again, or too many hand-offs: no progress, so this costs
+                                # a lifeline (and the next plan is generated under a new attempt key)
+                                lifelines_left -= 1
+                                log("loop", f"⚠️ Intermediate result is not converging — Lifelines left: {lifelines_left}")
+                                self.context.report("retry", lifelines_left=lifelines_left)
+                                continue
+                            forwarded.add(content)
                             self.context.user_input_override  = (
                                 f"Original user task: {self.context.user_input}\n\n"
                                 f"Your last tool produced this result:\n\n"
@@ -123,10 +185,15 @@ class AgentLoop:
                     )
 
                     if success and "FURTHER_PROCESSING_REQUIRED:" not in result:
+                        await self._learn_from_success(perception, plan_reused)
                         return {"status": "done", "result": self.context.final_answer}
                     else:
+                        if plan_reused:
+                            plan_cache.discard(self.context.user_input, plan)
+                        forget_plan(plan)
                         lifelines_left -= 1
                         log("loop", f"🛠 Retrying... Lifelines left: {lifelines_left}")
+                        self.context.report("retry", lifelines_left=lifelines_left)
                         continue
                 else:
                     log("loop", f"⚠️ Invalid plan detected — retrying... Lifelines left: {lifelines_left-1}")
@@ -136,3 +203,16 @@ class AgentLoop:
         log("loop", "⚠️ Max steps reached without finding final answer.")
         self.context.final_answer = "FINAL_ANSWER: [Max steps reached]"
         return {"status": "done", "result": self.context.final_answer}
+
+    async def _learn_from_success(self, perception, plan_reused: bool):
+        """
+        Teach the server router which servers answered this query (LLM-picked routes only)
+        and keep the winning solve() for similar queries (single-plan answers only).
+        """
+        router = self.context.server_router
+        if router and "fast_path" not in perception.tags:
+            await router.record(self.context.user_input, perception.selected_servers)
+
+        plan_cache = self.context.plan_cache
+        if plan_cache and not plan_reused and not getattr(self.context, "user_input_override", None):
+            plan_cache.store_from_memory(self.context.user_input, self.context.memory.get_session_items())
@@ -0,0 +1,190 @@
+# core/runtime.py
+
+import asyncio
+import threading
+from typing import Optional, Any, Dict, Callable
+from core.config import get_profile
+from core.loop import AgentLoop
+from core.session import MultiMCP
+from core.context import AgentContext
+from modules.model_manager import close_http_client, llm_cache_stats, model_health_stats
+from modules.tool_index import ToolIndex
+from modules.server_router import ServerRouter
+from modules.plan_cache import PlanCache, catalog_hash
+from modules.sandbox_pool import SandboxPool
+from modules.tools import preload_prompts
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+
+def read_in_thread(read: Callable[[], str]) -> asyncio.Future:
+    """
+    Run a blocking console read (input, sys.stdin.readline) without blocking the event loop.
+    A daemon thread is used instead of asyncio.to_thread so that a read still waiting at
+    shutdown does not keep the process alive.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(setter, value):
+        if not future.done():
+            setter(value)
+
+    def reader():
+        try:
+            value = read()
+            setter = future.set_result
+        except BaseException as e:  # EOFError / KeyboardInterrupt belong to the awaiting task
+            value, setter = e, future.set_exception
+        try:
+            loop.call_soon_threadsafe(settle, setter, value)
+        except RuntimeError:
+            pass  # event loop already closed
+
+    threading.Thread(target=reader, daemon=True).start()
+    return future
+
+
+class AgentRuntime:
+    """
+    The components every session shares: the MCP servers, tool index, plan cache, sandbox
+    pool and server router. Built once per process; each query then gets its own
+    AgentContext (memory, step state) on top of them, so any number of AgentLoops can
+    run against one runtime at a time.
+    """
+
+    def __init__(self, profile: Optional[Dict[str, Any]] = None):
+        self.profile = profile or get_profile()
+        self.mcp_servers: Dict[str, Dict[str, Any]] = {}
+        self.multi_mcp: Optional[MultiMCP] = None
+        self.tool_index: Optional[ToolIndex] = None
+        self.plan_cache: Optional[PlanCache] = None
+        self.sandbox_pool: Optional[SandboxPool] = None
+        self.server_router: Optional[ServerRouter] = None
+
+    async def start(self):
+        profile = self.profile
+        preload_prompts()  # parse every prompt template now, so a broken one fails before the first query
+        self.mcp_servers = {server["id"]: server for server in profile.get("mcp_servers", [])}
+
+        self.multi_mcp = MultiMCP(
+            server_configs=list(self.mcp_servers.values()),
+            cache_config=profile.get("tool_cache"),
+        )
+        await self.multi_mcp.initialize()
+
+        # Embed every discovered tool once so each step can put only the relevant ones in the prompt
+        retrieval_config = profile.get("tool_retrieval") or {}
+        self.tool_index = ToolIndex(
+            path=retrieval_config.get("index_path", "cache/tool_embeddings.json"),
+            top_k=retrieval_config.get("top_k", 6),
+        )
+        await self.tool_index.build(self.multi_mcp.get_all_tools())
+
+        # Successful solve() programs keyed by query shape; a tool change invalidates them via the catalog hash
+        plan_cache_config = profile.get("plan_cache") or {}
+        if plan_cache_config.get("enabled", True):
+            self.plan_cache = PlanCache(
+                path=plan_cache_config.get("path", "cache/plans.sqlite"),
+                catalog=catalog_hash(self.multi_mcp.get_all_tools()),
+                max_entries=plan_cache_config.get("max_entries", 1000),
+            )
+
+        # solve() plans run in pre-warmed worker processes, off the event loop and under rlimits
+        sandbox_config = profile.get("sandbox") or {}
+        if sandbox_config.get("workers", 2):
+            self.sandbox_pool = SandboxPool(
+                workers=sandbox_config.get("workers", 2),
+                deadline=sandbox_config.get("deadline_s", 180),
+                cpu_seconds=sandbox_config.get("cpu_seconds", 30),
+                memory_mb=sandbox_config.get("memory_mb", 1024),
+                max_plans_per_worker=sandbox_config.get("max_plans_per_worker", 50),
+            )
+            await self.sandbox_pool.start()
+
+        # Picks servers locally for familiar or keyword-obvious queries; perception LLM otherwise
+        routing_config = profile.get("server_routing") or {}
+        if routing_config.get("enabled", True):
+            self.server_router = ServerRouter(
+                self.mcp_servers,
+                examples_path=routing_config.get("examples_path", "cache/server_examples.json"),
+                max_examples=routing_config.get("max_examples", 500),
+                min_confidence=routing_config.get("min_confidence", 0.7),
+                neighbour_threshold=routing_config.get("neighbour_threshold", 0.9),
+            )
+
+    def new_context(
+        self,
+        user_input: str,
+        session_id: Optional[str] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> AgentContext:
+        return AgentContext(
+            user_input=user_input,
+            session_id=session_id,
+            dispatcher=self.multi_mcp,
+            mcp_server_descriptions=self.mcp_servers,
+            tool_index=self.tool_index,
+            server_router=self.server_router,
+            plan_cache=self.plan_cache,
+            sandbox_pool=self.sandbox_pool,
+            on_progress=on_progress,
+        )
+
+    async def solve(
+        self,
+        user_input: str,
+        session_id: Optional[str] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run one query to its final answer, re-running the agent on FURTHER_PROCESSING_REQUIRED
+        results within the same session. Returns {"session_id", "answer", "raw"}.
+        """
+        while True:
+            context = self.new_context(user_input, session_id, on_progress)
+            session_id = context.session_id
+            result = await AgentLoop(context).run()
+            answer = result["result"] if isinstance(result, dict) else str(result)
+
+            if "FINAL_ANSWER:" in answer:
+                return {"session_id": session_id, "answer": answer.split("FINAL_ANSWER:")[1].strip(), "raw": answer}
+            if "FURTHER_PROCESSING_REQUIRED:" in answer:
+                user_input = answer.split("FURTHER_PROCESSING_REQUIRED:")[1].strip()
+                context.report("further_processing", input=user_input)
+                continue
+            return {"session_id": session_id, "answer": answer, "raw": answer}
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"mcp": self.multi_mcp.stats() if self.multi_mcp else {}, "llm_cache": llm_cache_stats()}
+        if self.server_router:
+            stats["server_router"] = self.server_router.stats()
+        if self.plan_cache:
+            stats["plan_cache"] = self.plan_cache.stats()
+        if self.sandbox_pool:
+            stats["sandbox"] = self.sandbox_pool.stats()
+        return stats
+
+    async def shutdown(self):
+        if self.multi_mcp:
+            log("mcp", f"MCP stats: {self.multi_mcp.stats()}")
+        log("llm", f"LLM cache stats: {llm_cache_stats()}")
+        log("llm", f"Model health: {model_health_stats()}")
+        if self.server_router:
+            log("perception", f"Server router stats: {self.server_router.stats()}")
+        if self.plan_cache:
+            log("plan", f"Plan cache stats: {self.plan_cache.stats()}")
+            self.plan_cache.close()
+        if self.sandbox_pool:
+            log("sandbox", f"Sandbox pool stats: {self.sandbox_pool.stats()}")
+            await self.sandbox_pool.shutdown()
+        if self.multi_mcp:
+            await self.multi_mcp.shutdown()  # Terminate the persistent MCP server processes
+        await close_http_client()
@@ -2,9 +2,24 @@
 
 import os
 import sys
+import time
+import asyncio
+import functools
+import contextvars
+import importlib.util
+import anyio
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from typing import Optional, Any, List, Dict
-from mcp import ClientSession, StdioServerParameters
+from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+from core.catalog import ToolCatalog, DEFAULT_CATALOG_PATH
+from core.tool_cache import ToolResultCache, canonical_key, DEFAULT_MAX_ENTRIES
+from core.limits import ConcurrencyLimiter
+from contextlib import AsyncExitStack, asynccontextmanager, nullcontext
 
 
 class MCP:
@@ -48,67 +63,600 @@ class MCP:
                 return await session.call_tool(tool_name, arguments=arguments)
 
 
+UNHEALTHY_COOLDOWN = 5  # seconds a replica that failed to start is skipped by routing
+DEFAULT_TOOL_TIMEOUT = 120  # seconds, used when neither the tool nor its server sets one
+HEDGE_MIN_SAMPLES = 10  # latency samples needed before a tool's p95 is trusted for hedging
+LATENCY_WINDOW = 100
+
+
+class HedgeSkipped(Exception):
+    """No concurrency slot was free for a hedged backup attempt, so none was sent."""
+
+
+def is_connection_error(error: Exception) -> bool:
+    """True when the error means the server process/pipe is gone (not a tool-level failure)."""
+    if isinstance(error, (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)):
+        return True
+    if isinstance(error, McpError):
+        return getattr(error.error, "code", None) == CONNECTION_CLOSED
+    return isinstance(error, (BrokenPipeError, ConnectionResetError))
+
+
+_inprocess_servers: Dict[str, Any] = {}  # server id → imported FastMCP instance
+
+# FastMCP calls sync tools inline (fn(**arguments)), which would stall the agent's event loop
+# and every other session for the length of the call. In-process sync tools run here instead;
+# a dedicated pool, so a stuck tool cannot starve asyncio.to_thread users elsewhere.
+INPROCESS_TOOL_THREADS = 8
+_inprocess_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _run_off_loop(fn):
+    @functools.wraps(fn)
+    async def wrapper(**kwargs):
+        global _inprocess_executor
+        if _inprocess_executor is None:
+            _inprocess_executor = ThreadPoolExecutor(INPROCESS_TOOL_THREADS, thread_name_prefix="mcp-inprocess")
+        call = functools.partial(contextvars.copy_context().run, fn, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(_inprocess_executor, call)
+    return wrapper
+
+
+def _offload_sync_tools(server: Any):
+    """Make every sync tool of an in-process FastMCP app run on a worker thread."""
+    for tool in server._tool_manager.list_tools():
+        if not tool.is_async:
+            tool.fn = _run_off_loop(tool.fn)
+            tool.is_async = True
+
+
+def load_inprocess_server(config: dict) -> Any:
+    """
+    Import a server script into this process and return its module-level `mcp` FastMCP app.
+    The script's cwd and own directory go on sys.path so its local imports (models, memory) resolve.
+    Imported once per server id; later sessions reuse the same app.
+    """
+    server_id = config["id"]
+    if server_id in _inprocess_servers:
+        return _inprocess_servers[server_id]
+
+    cwd = config.get("cwd", os.getcwd())
+    path = os.path.join(cwd, config["script"])
+    for entry in (cwd, os.path.dirname(os.path.abspath(path))):
+        if entry not in sys.path:
+            sys.path.insert(0, entry)
+
+    spec = importlib.util.spec_from_file_location(f"mcp_inprocess_{server_id}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # the `if __name__ == "__main__"` block does not run
+    server = getattr(module, "mcp", None)
+    if server is None:
+        raise RuntimeError(f"{config['script']} has no module-level `mcp` FastMCP instance")
+    _offload_sync_tools(server)
+    _inprocess_servers[server_id] = server
+    return server
+
+
+class ServerSession:
+    """
+    Long-lived MCP session for a single server config.
+    The stdio subprocess and ClientSession are owned by one background task, because
+    anyio cancel scopes must be entered and exited from the same task.
+    """
+
+    def __init__(self, config: dict, replica: int = 0):
+        self.config = config
+        self.replica = replica
+        self.session: Optional[ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None
+        self._lock = asyncio.Lock()
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        # Per-replica counters used for routing and reported by MultiMCP.stats()
+        self.calls = 0
+        self.errors = 0
+        self.latency_ewma = 0.0  # seconds, exponentially weighted
+        self.unhealthy_until = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    @property
+    def name(self) -> str:
+        return f"{self.config['id']}#{self.replica}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_ms": round(self.latency_ewma * 1000, 2),
+        }
+
+    def _params(self) -> StdioServerParameters:
+        return StdioServerParameters(
+            command=self.config.get("command", sys.executable),
+            args=[self.config["script"]],
+            cwd=self.config.get("cwd", os.getcwd())
+        )
+
+    async def _run(self):
+        try:
+            if self.config.get("transport") == "inprocess":
+                # Same ClientSession API over in-memory streams: no subprocess, no pipes,
+                # and call_tool still returns a CallToolResult so solve() plans are unchanged.
+                server = load_inprocess_server(self.config)
+                async with create_connected_server_and_client_session(server) as session:
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+                return
+            async with stdio_client(self._params()) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()  # hold the process open until close()
+        except BaseException as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def start(self) -> ClientSession:
+        async with self._lock:
+            if self.connected:
+                return self.session
+            await self._close_task()
+            print(f"→ Starting MCP server: {self.config['script']} (replica {self.replica})")
+            self._ready = asyncio.Event()
+            self._stop = asyncio.Event()
+            self._error = None
+            self._task = asyncio.create_task(self._run())
+            await self._ready.wait()
+            if self.session is None:
+                self.unhealthy_until = time.monotonic() + UNHEALTHY_COOLDOWN
+                raise RuntimeError(f"Could not start MCP server {self.config['script']}: {self._error}")
+            self.last_used = time.monotonic()  # a fresh start counts as use for the reaper
+            return self.session
+
+    async def _close_task(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=5)
+        except (asyncio.TimeoutError, Exception):
+            self._task.cancel()
+        self._task = None
+        self.session = None
+
+    async def close(self):
+        async with self._lock:
+            await self._close_task()
+
+    async def _drop(self, session: ClientSession):
+        """Close a broken session, unless another caller has already replaced it."""
+        async with self._lock:
+            if self.session is session:
+                await self._close_task()
+
+    async def list_tools(self) -> List[Any]:
+        session = await self.start()
+        return (await session.list_tools()).tools
+
+    def idle_for(self) -> float:
+        return 0.0 if self.in_flight else time.monotonic() - self.last_used
+
+    async def close_if_idle(self, timeout: float) -> bool:
+        # Re-checked under the lock so a call that is just starting is never cut off
+        async with self._lock:
+            if self._task is None or self.idle_for() <= timeout:
+                return False
+            await self._close_task()
+            return True
+
+    async def _call_once(self, session: ClientSession, tool_name: str, arguments: dict, timeout: Optional[float]) -> Any:
+        # ClientSession assigns the JSON-RPC id synchronously when the request is sent,
+        # so reading it here (same task, no await in between) gives us this call's id.
+        request_id = session._request_id
+        try:
+            async with asyncio.timeout(timeout):
+                return await session.call_tool(tool_name, arguments)
+        except TimeoutError:
+            await self._cancel_remote(session, request_id, f"timed out after {timeout}s")
+            raise TimeoutError(f"Tool '{tool_name}' timed out after {timeout}s on {self.name}")
+        except asyncio.CancelledError:
+            await self._cancel_remote(session, request_id, "cancelled by client")
+            raise
+
+    async def _cancel_remote(self, session: ClientSession, request_id: int, reason: str):
+        """Tell the server to stop working on an abandoned request."""
+        try:
+            await session.send_notification(types.ClientNotification(
+                types.CancelledNotification(
+                    params=types.CancelledNotificationParams(requestId=request_id, reason=reason)
+                )
+            ))
+        except Exception:
+            pass  # server already gone; nothing left to cancel
+
+    async def call_tool(
+        self, tool_name: str, arguments: dict, timeout: Optional[float] = None, idempotent: bool = False
+    ) -> Any:
+        self.in_flight += 1
+        self.calls += 1
+        started = time.monotonic()
+        try:
+            session = await self.start()
+            try:
+                return await self._call_once(session, tool_name, arguments, timeout)
+            except Exception as e:
+                if not is_connection_error(e):
+                    raise
+                # Server crashed or pipe broke. The next call restarts it; only an idempotent
+                # (cacheable) call is replayed, since the others may already have taken effect
+                print(f"⚠️ MCP server {self.name} disconnected ({e}), reconnecting...")
+                await self._drop(session)
+                # A closed write stream means the request never left; that is always safe to resend
+                if not idempotent and not isinstance(e, anyio.ClosedResourceError):
+                    raise RuntimeError(
+                        f"MCP server {self.name} disconnected during '{tool_name}'; not retried, it may have run"
+                    ) from e
+                session = await self.start()
+                try:
+                    return await self._call_once(session, tool_name, arguments, timeout)
+                except Exception as e:
+                    if is_connection_error(e):
+                        await self._drop(session)
+                    raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+            elapsed = self.last_used - started
+            self.latency_ewma = elapsed if self.calls == 1 else 0.8 * self.latency_ewma + 0.2 * elapsed
+
+
+class ServerPool:
+    """
+    `replicas` warm ServerSessions for one server config.
+    Each call goes to the least-loaded healthy replica (fewest in-flight calls,
+    then lowest recent latency), preferring replicas that are already running.
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        count = max(1, int(config.get("replicas", 1)))
+        self.replicas: List[ServerSession] = [ServerSession(config, replica=i) for i in range(count)]
+        self.hedges = 0
+
+    @property
+    def connected(self) -> bool:
+        return all(replica.connected for replica in self.replicas)
+
+    def pick(self, exclude: Optional[ServerSession] = None) -> ServerSession:
+        candidates = [r for r in self.replicas if r is not exclude] or self.replicas
+        return min(
+            candidates,
+            key=lambda r: (not r.healthy, r.in_flight, not r.connected, r.latency_ewma),
+        )
+
+    async def start(self):
+        await asyncio.gather(*(replica.start() for replica in self.replicas))
+
+    async def close(self):
+        await asyncio.gather(*(replica.close() for replica in self.replicas), return_exceptions=True)
+
+    async def list_tools(self) -> List[Any]:
+        return await self.pick().list_tools()
+
+    async def call_tool(
+        self,
+        tool_name: str,
+        arguments: dict,
+        timeout: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        idempotent: bool = False,
+        hedge_slot: Optional[Any] = None,
+    ) -> Any:
+        """
+        Call the least-loaded replica; `idempotent` calls are replayed once if the server drops.
+        With `hedge_after` set (idempotent tools only), a second attempt goes to another
+        replica if the first has not answered within that many seconds, provided
+        `hedge_slot()` yields True (the caller's concurrency limits have room for it).
+        The first successful answer wins and the loser is cancelled.
+        """
+        primary = self.pick()
+        if hedge_after is None or len(self.replicas) < 2:
+            return await primary.call_tool(tool_name, arguments, timeout, idempotent)
+
+        attempts = [asyncio.ensure_future(primary.call_tool(tool_name, arguments, timeout, idempotent))]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=hedge_after)
+            if not done:
+                backup = self.pick(exclude=primary)
+                attempts.append(asyncio.ensure_future(
+                    self._hedge(backup, tool_name, arguments, timeout, hedge_after, hedge_slot)
+                ))
+
+            pending = set(attempts)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        return attempt.result()
+                    if not isinstance(attempt.exception(), HedgeSkipped):
+                        error = attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def _hedge(
+        self, backup: ServerSession, tool_name: str, arguments: dict, timeout: Optional[float],
+        hedge_after: float, hedge_slot: Optional[Any],
+    ) -> Any:
+        # The backup holds its own limiter slot(s) for as long as it runs
+        async with (hedge_slot() if hedge_slot else nullcontext(True)) as granted:
+            if not granted:
+                raise HedgeSkipped(f"no free slot to hedge {tool_name}")
+            print(f"→ Hedging {tool_name} on {backup.name} after {hedge_after:.2f}s")
+            self.hedges += 1
+            return await backup.call_tool(tool_name, arguments, timeout, True)
+
+
+DEFAULT_IDLE_TIMEOUT = 300  # seconds a started server may sit unused before it is reaped
+REAP_INTERVAL = 30
+
+
 class MultiMCP:
     """
-    Stateless version: discovers tools from multiple MCP servers, but reconnects per tool call.
-    Each call_tool() uses a fresh session based on tool-to-server mapping.
+    Discovers tools from multiple MCP servers and keeps one persistent session per server.
+    Servers are started lazily (on first call or when perception selects them), stay up
+    while in use, and are reaped after `idle_timeout` seconds without calls.
     """
 
-    def __init__(self, server_configs: List[dict]):
+    def __init__(
+        self,
+        server_configs: List[dict],
+        catalog_path: str = DEFAULT_CATALOG_PATH,
+        idle_timeout: Optional[float] = DEFAULT_IDLE_TIMEOUT,
+        cache_config: Optional[dict] = None,
+    ):
         self.server_configs = server_configs
         self.tool_map: Dict[str, Dict[str, Any]] = {}  # tool_name → {config, tool}
         self.server_tools: Dict[str, List[Any]] = {}  # server_name -> list of tools
+        self.sessions: Dict[str, ServerPool] = {}  # server_name -> pool of persistent sessions
+        self.catalog = ToolCatalog(catalog_path)
+        self.idle_timeout = idle_timeout
+        cache_config = cache_config or {}
+        self.cache = ToolResultCache(
+            max_entries=cache_config.get("max_entries", DEFAULT_MAX_ENTRIES),
+            disk_path=cache_config.get("disk_path"),
+        )
+        self._reaper: Optional[asyncio.Task] = None
+        self._warmups: set = set()
+        self._pending: Dict[str, asyncio.Future] = {}  # cache key → in-flight execution
+        self.coalesced = 0
+        self.latencies: Dict[str, deque] = {}  # tool_name → recent successful call durations
+        self.limiters: Dict[str, ConcurrencyLimiter] = {}  # "server" or "server/tool" → limiter
 
 
     async def initialize(self):
+        """
+        Discover tools from all servers concurrently.
+        Servers whose script is unchanged since the last run are served from the
+        on-disk catalog without spawning a process.
+        """
         print("in MultiMCP initialize")
-        for config in self.server_configs:
-            try:
-                params = StdioServerParameters(
-                    command=sys.executable,
-                    args=[config["script"]],
-                    cwd=config.get("cwd", os.getcwd())
-                )
-                print(f"→ Scanning tools from: {config['script']} in {params.cwd}")
-                async with stdio_client(params) as (read, write):
-                    print("Connection established, creating session...")
-                    try:
-                        async with ClientSession(read, write) as session:
-                            print("[agent] Session created, initializing...")
-                            await session.initialize()
-                            print("[agent] MCP session initialized")
-                            tools = await session.list_tools()
-                            print(f"→ Tools received: {[tool.name for tool in tools.tools]}")
-                            for tool in tools.tools:
-                                self.tool_map[tool.name] = {
-                                    "config": config,
-                                    "tool": tool
-                                }
-                                server_key = config["id"]  # fallback to script name if no key
-                                if server_key not in self.server_tools:
-                                    self.server_tools[server_key] = []
-                                self.server_tools[server_key].append(tool)
-                    except Exception as se:
-                        print(f"❌ Session error: {se}")
-            except Exception as e:
-                print(f"❌ Error initializing MCP server {config['script']}: {e}")
+        self.catalog.load()
+        results = await asyncio.gather(*(self._discover(config) for config in self.server_configs))
+
+        for config, tools in zip(self.server_configs, results):
+            for tool in tools:
+                self.tool_map[tool.name] = {
+                    "config": config,
+                    "tool": tool
+                }
+                server_key = config["id"]  # fallback to script name if no key
+                if server_key not in self.server_tools:
+                    self.server_tools[server_key] = []
+                self.server_tools[server_key].append(tool)
+
+        self.catalog.save()
+
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def _discover(self, config: dict) -> List[Any]:
+        fingerprint = ToolCatalog.fingerprint(config)
+        cached = self.catalog.get(config["id"], fingerprint)
+        if cached is not None:
+            print(f"→ Tools for {config['id']} loaded from catalog: {[tool.name for tool in cached]}")
+            return cached
+
+        try:
+            print(f"→ Scanning tools from: {config['script']} in {config.get('cwd', os.getcwd())}")
+            session = self._pool_for(config)
+            tools = await session.list_tools()
+            print(f"→ Tools received: {[tool.name for tool in tools]}")
+            self.catalog.put(config["id"], fingerprint, tools)
+            # Discovery only needed the tool list; the server restarts when perception selects it
+            await session.close()
+            return tools
+        except Exception as e:
+            print(f"❌ Error initializing MCP server {config['script']}: {e}")
+            return []
+
+    def _pool_for(self, config: dict) -> ServerPool:
+        pool = self.sessions.get(config["id"])
+        if pool is None:
+            pool = self.sessions[config["id"]] = ServerPool(config)
+        return pool
+
+    def warm_up(self, server_ids: List[str]):
+        """
+        Start the given servers in the background (e.g. right after perception selects them)
+        so process startup overlaps with planning instead of delaying the first tool call.
+        """
+        configs = {config["id"]: config for config in self.server_configs}
+        for server_id in server_ids:
+            config = configs.get(server_id)
+            if config is None or self._pool_for(config).connected:
+                continue
+            task = asyncio.create_task(self._warm_up_one(config))
+            self._warmups.add(task)
+            task.add_done_callback(self._warmups.discard)
+
+    async def _warm_up_one(self, config: dict):
+        try:
+            await self._pool_for(config).start()
+        except Exception as e:
+            print(f"❌ Could not warm up MCP server {config['script']}: {e}")
+
+    async def _reap_idle(self):
+        """Close servers that have not served a call within their idle timeout."""
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            for pool in list(self.sessions.values()):
+                timeout = pool.config.get("idle_timeout", self.idle_timeout)
+                if not timeout:
+                    continue
+                for replica in pool.replicas:
+                    if replica.connected and await replica.close_if_idle(timeout):
+                        print(f"→ Reaped idle MCP server: {replica.name}")
+
+    @staticmethod
+    def _cache_ttl(config: dict, tool_name: str) -> float:
+        """TTL in seconds from the server's `cache_ttl` map ("*" applies to every tool); 0 = don't cache."""
+        ttls = config.get("cache_ttl") or {}
+        return ttls.get(tool_name, ttls.get("*", 0))
+
+    def is_idempotent(self, tool_name: str) -> bool:
+        """Tools with a cache TTL are read-only: safe to cache, coalesce, hedge, replay or start early."""
+        entry = self.tool_map.get(tool_name)
+        return bool(entry and self._cache_ttl(entry["config"], tool_name))
 
     async def call_tool(self, tool_name: str, arguments: dict) -> Any:
+        """
+        Route a call to the tool's server pool.
+        Tools with a cache TTL are treated as read-only: results are cached, and identical
+        concurrent calls are coalesced so they share one execution (single-flight).
+        """
         entry = self.tool_map.get(tool_name)
         if not entry:
             raise ValueError(f"Tool '{tool_name}' not found on any server.")
 
         config = entry["config"]
-        params = StdioServerParameters(
-            command=sys.executable,
-            args=[config["script"]],
-            cwd=config.get("cwd", os.getcwd())
-        )
+        ttl = self._cache_ttl(config, tool_name)
+        if not ttl:
+            return await self._dispatch(config, tool_name, arguments, idempotent=False)
 
-        async with stdio_client(params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                return await session.call_tool(tool_name, arguments)
+        key = canonical_key(tool_name, arguments)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._call_and_cache(config, tool_name, arguments, key, ttl))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: one caller giving up must not cancel the execution the others are waiting on
+        return await asyncio.shield(pending)
+
+    async def _call_and_cache(self, config: dict, tool_name: str, arguments: dict, key: str, ttl: float) -> Any:
+        result = await self._dispatch(config, tool_name, arguments, idempotent=True)
+        self.cache.put(key, result, ttl)
+        return result
+
+    @staticmethod
+    def _tool_timeout(config: dict, tool_name: str) -> float:
+        """Deadline in seconds: `tool_timeouts[tool]`, else the server's `timeout`, else the default."""
+        timeouts = config.get("tool_timeouts") or {}
+        return timeouts.get(tool_name, config.get("timeout", DEFAULT_TOOL_TIMEOUT))
+
+    def _hedge_delay(self, tool_name: str) -> Optional[float]:
+        samples = self.latencies.get(tool_name)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def _limiters_for(self, config: dict, tool_name: str) -> List[ConcurrencyLimiter]:
+        """
+        Limiters that apply to this call, tool first then server, built lazily from
+        `tool_limits[tool]` and the server's `max_concurrency` / `max_queue`.
+        The server limit is shared by all of its replicas.
+        """
+        limiters = []
+        tool_limits = (config.get("tool_limits") or {}).get(tool_name)
+        if tool_limits and tool_limits.get("max_concurrency"):
+            limiters.append(self._limiter(f"{config['id']}/{tool_name}", tool_limits))
+        if config.get("max_concurrency"):
+            limiters.append(self._limiter(config["id"], config))
+        return limiters
+
+    def _limiter(self, name: str, limits: dict) -> ConcurrencyLimiter:
+        limiter = self.limiters.get(name)
+        if limiter is None:
+            limiter = self.limiters[name] = ConcurrencyLimiter(
+                name, limits["max_concurrency"], limits.get("max_queue")
+            )
+        return limiter
+
+    async def _dispatch(self, config: dict, tool_name: str, arguments: dict, idempotent: bool) -> Any:
+        hedge_after = self._hedge_delay(tool_name) if idempotent and config.get("hedge") else None
+        limiters = self._limiters_for(config, tool_name)
+
+        @asynccontextmanager
+        async def hedge_slot():
+            # A hedged attempt is a second concurrent call: it needs its own slots, taken only if free
+            async with AsyncExitStack() as stack:
+                for limiter in limiters:
+                    if not await stack.enter_async_context(limiter.slot_if_free()):
+                        yield False
+                        return
+                yield True
+
+        async with AsyncExitStack() as stack:
+            # Tool slot first, so calls queued on one busy tool don't hold server-wide slots
+            for limiter in limiters:
+                await stack.enter_async_context(limiter.slot())
+            started = time.monotonic()
+            result = await self._pool_for(config).call_tool(
+                tool_name, arguments, timeout=self._tool_timeout(config, tool_name), hedge_after=hedge_after,
+                idempotent=idempotent, hedge_slot=hedge_slot,
+            )
+        self.latencies.setdefault(tool_name, deque(maxlen=LATENCY_WINDOW)).append(time.monotonic() - started)
+        return result
+
+    async def call_tools(self, calls: List[Any], return_exceptions: bool = False) -> List[Any]:
+        """
+        Run independent tool calls concurrently and return their results in call order.
+        `calls` is a list of (tool_name, arguments) pairs. Calls to different servers run in
+        parallel and calls to the same server are pipelined over its pooled sessions.
+        """
+        return await asyncio.gather(
+            *(self.call_tool(tool_name, arguments) for tool_name, arguments in calls),
+            return_exceptions=return_exceptions,
+        )
 
     async def list_all_tools(self) -> List[str]:
         return list(self.tool_map.keys())
@@ -125,5 +673,24 @@ class MultiMCP:
 
 
 
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of replica counters, concurrency limiters (incl. queue wait) and the result cache."""
+        return {
+            "replicas": {
+                server_id: [replica.stats() for replica in pool.replicas]
+                for server_id, pool in self.sessions.items()
+            },
+            "hedges": {server_id: pool.hedges for server_id, pool in self.sessions.items()},
+            "limits": {name: limiter.stats() for name, limiter in self.limiters.items()},
+            "cache": self.cache.stats(),
+            "coalesced": self.coalesced,
+        }
+
     async def shutdown(self):
-        pass  # no persistent sessions to close
\ No newline at end of file
+        """Close every persistent session and terminate the server processes."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        await asyncio.gather(*(session.close() for session in self.sessions.values()), return_exceptions=True)
+        self.sessions.clear()
+        self.cache.close()
@@ -3,9 +3,10 @@
 from typing import List, Optional, Any
 from modules.perception import PerceptionResult
 from modules.memory import MemoryItem
-from modules.model_manager import ModelManager
+from modules.model_manager import get_model_manager
 from core.context import AgentContext
 from modules.tools import filter_tools_by_hint, summarize_tools, load_prompt
+from modules.prompt_builder import build_prompt, PromptSection
 
 # Optional fallback logger
 try:
@@ -27,7 +28,7 @@ def select_decision_prompt_path(planning_mode: str, exploration_mode: Optional[s
             return "prompts/decision_prompt_exploratory_sequential.txt"
     return "prompts/decision_prompt_conservative.txt"  # safe fallback
 
-model = ModelManager()
+model = get_model_manager(role="planning")
 
 async def decide_next_action(
     context: AgentContext,
@@ -55,18 +56,22 @@ async def decide_next_action(
 
     # Filter tools based on Perception hint
     tool_hint = perception.tool_hint
-    filtered_tools = filter_tools_by_hint(all_tools, hint=tool_hint)
+    user_input = getattr(context, "user_input_override", None) or context.user_input
+    if context.tool_index:
+        filtered_tools = await context.tool_index.search(user_input, all_tools, hint=tool_hint)
+    else:
+        filtered_tools = filter_tools_by_hint(all_tools, hint=tool_hint)
     filtered_summary = summarize_tools(filtered_tools)
 
     if planning_mode == "conservative":
         return await conservative_plan(
-            perception, memory_items, filtered_summary, all_tools, step_num, max_steps,
+            user_input, perception, memory_items, filtered_summary, all_tools, step_num, max_steps,
             prompt_path, force_replan
         )
 
     if planning_mode == "exploratory":
         return await exploratory_plan(
-            perception, memory_items, filtered_summary, all_tools, step_num, max_steps,
+            user_input, perception, memory_items, filtered_summary, all_tools, step_num, max_steps,
             exploration_mode, memory_fallback_enabled, prompt_path, force_replan, failed_tools
         )
 
@@ -74,6 +79,7 @@ async def decide_next_action(
     full_summary = summarize_tools(all_tools)
     plan = await generate_plan(
         perception=perception,
+        user_input=user_input,
         memory_items=memory_items,
         tool_descriptions=full_summary,
         prompt_path=prompt_path,
@@ -84,6 +90,7 @@ async def decide_next_action(
 
 # === CONSERVATIVE MODE ===
 async def conservative_plan(
+    user_input: str,
     perception: PerceptionResult,
     memory_items: List[MemoryItem],
     filtered_summary: str,
@@ -103,6 +110,7 @@ async def conservative_plan(
 
     plan = await generate_plan(
         perception=perception,
+        user_input=user_input,
         memory_items=memory_items,
         tool_descriptions=tool_context,
         prompt_path=prompt_path,
@@ -114,6 +122,7 @@ async def conservative_plan(
 
 # === EXPLORATORY MODE ===
 async def exploratory_plan(
+    user_input: str,
     perception: PerceptionResult,
     memory_items: List[MemoryItem],
     filtered_summary: str,
@@ -138,6 +147,7 @@ async def exploratory_plan(
                 fallback_summary = summarize_tools(fallback_tools)
                 return await generate_plan(
                     perception=perception,
+                    user_input=user_input,
                     memory_items=memory_items,
                     tool_descriptions=fallback_summary,
                     prompt_path=prompt_path,
@@ -150,6 +160,7 @@ async def exploratory_plan(
         tool_context = summarize_tools(all_tools)
         return await generate_plan(
             perception=perception,
+            user_input=user_input,
             memory_items=memory_items,
             tool_descriptions=tool_context,
             prompt_path=prompt_path,
@@ -165,6 +176,7 @@ async def exploratory_plan(
 
     plan = await generate_plan(
         perception=perception,
+        user_input=user_input,
         memory_items=memory_items,
         tool_descriptions=tool_context,
         prompt_path=prompt_path,
@@ -176,6 +188,7 @@ async def exploratory_plan(
 
 # === GENERATE PLAN ===
 async def generate_plan(
+    user_input: str,
     perception: PerceptionResult,
     memory_items: List[MemoryItem],
     tool_descriptions: str,
@@ -187,10 +200,16 @@ async def generate_plan(
 
     prompt_template = load_prompt(prompt_path)
 
-    final_prompt = prompt_template.format(
-        tool_descriptions=tool_descriptions,
-        user_input=perception.user_input
-    )
+    # The decision templates also take {memory_texts}; same section as modules/decision.py
+    memory_texts = "\n".join(
+        f"- {m.text}" for m in reversed(memory_items) if m.type == "tool_output"
+    ) or "None"
+
+    final_prompt = build_prompt("planning", prompt_template, [
+        PromptSection(name="user_input", text=user_input, required=True),
+        PromptSection(name="memory_texts", text=memory_texts, priority=1, split_lines=True),
+        PromptSection(name="tool_descriptions", text=tool_descriptions, priority=2, min_tokens=600, split_lines=True),
+    ])
 
     raw = (await model.generate_text(final_prompt)).strip()
     log("plan", f"Generated solve():\n{raw}")
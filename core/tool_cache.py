@@ -0,0 +1,102 @@
+# core/tool_cache.py
+
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+from collections import OrderedDict
+from typing import Optional, Any, Dict, Tuple
+from mcp.types import CallToolResult
+
+DEFAULT_MAX_ENTRIES = 512
+
+
+def canonical_key(tool_name: str, arguments: dict) -> str:
+    """Stable cache key: same tool + same arguments (in any key order) → same key."""
+    payload = json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{tool_name}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class ToolResultCache:
+    """
+    Two-tier cache for MCP tool results.
+    Memory tier is a bounded LRU; the optional disk tier (SQLite) survives restarts.
+    Every entry carries its own expiry, taken from the tool's TTL at store time.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # key → (expires_at, result)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.db: Optional[sqlite3.Connection] = None
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(disk_path)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS tool_results (key TEXT PRIMARY KEY, expires_at REAL, result TEXT)"
+            )
+            self.db.execute("DELETE FROM tool_results WHERE expires_at < ?", (time.time(),))
+            self.db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at >= now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self.entries[key]
+
+        if self.db is not None:
+            row = self.db.execute(
+                "SELECT expires_at, result FROM tool_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[0] >= now:
+                result = CallToolResult.model_validate_json(row[1])
+                self._remember(key, row[0], result)
+                self.disk_hits += 1
+                return result
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, result: Any, ttl: float):
+        if getattr(result, "isError", False):
+            return  # never cache failures; the next retry should hit the server
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, result)
+        if self.db is not None and isinstance(result, CallToolResult):
+            self.db.execute(
+                "INSERT OR REPLACE INTO tool_results (key, expires_at, result) VALUES (?, ?, ?)",
+                (key, expires_at, result.model_dump_json()),
+            )
+            self.db.commit()
+
+    def _remember(self, key: str, expires_at: float, result: Any):
+        self.entries[key] = (expires_at, result)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
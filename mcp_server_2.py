@@ -169,10 +169,10 @@ async def answer_query_with_context(input: InterpretDocuments) -> str:
     """Answer user query using extracted text context. Usage: input={"input" = {"user_query": "your question", "extracted_text": "content"}} result = await mcp.call_tool('answer_query_with_context', input)"""
     
     try:
-        from modules.model_manager import ModelManager
+        from modules.model_manager import get_model_manager
         mcp_log("LLM_ANSWER", f"Query: {InterpretDocuments.user_query[:80]}...")
         
-        model = ModelManager()
+        model = get_model_manager()
         
         prompt = f"""You are a helpful assistant. Answer the user's question based on the provided context.
 
@@ -1,10 +1,13 @@
 # modules/action.py
 
-from typing import Dict, Any, Union
+from typing import Dict, Any, Union, Optional
 from pydantic import BaseModel
 import asyncio
 import types
 import json
+from core.tool_cache import canonical_key
+from modules.plan_analysis import independent_tool_calls, compile_plan
+from modules.tool_result import ToolResult
 
 
 # Optional logging fallback
@@ -24,8 +27,75 @@ class ToolCallResult(BaseModel):
 
 MAX_TOOL_CALLS_PER_PLAN = 5
 
-async def run_python_sandbox(code: str, dispatcher: Any) -> str:
-    print("[action] 🔍 Entered run_python_sandbox()")
+# Patch MCP client with real dispatcher
+# What is a dispatcher here? -> The dispatcher is an object responsible for managing and routing tool calls to the appropriate MCP (Multi-Client Proxy) servers. It acts as an intermediary that handles communication between the sandboxed code and the external services or tools that the code may need to interact with.
+class SandboxMCP:
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.call_count = 0
+        self.prefetched = {}  # canonical call key → [task] started before the plan asked
+
+    def prefetch(self, calls: list) -> int:
+        """
+        Start independent calls now; call_tool hands each result over when the plan asks for it.
+        Only idempotent (cacheable) tools are started early, each distinct call once, since
+        the plan may still fail before it gets there. Returns how many calls were started.
+        """
+        is_idempotent = getattr(self.dispatcher, "is_idempotent", None)
+        started = 0
+        for tool_name, input_dict in calls:
+            key = canonical_key(tool_name, input_dict)
+            if key in self.prefetched or not (is_idempotent and is_idempotent(tool_name)):
+                continue
+            task = asyncio.create_task(self.dispatcher.call_tool(tool_name, input_dict))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # unused results must not warn
+            self.prefetched[key] = [task]
+            started += 1
+        return started
+
+    def cancel_prefetch(self):
+        for tasks in self.prefetched.values():
+            for task in tasks:
+                task.cancel()
+        self.prefetched.clear()
+
+    async def call_tool(self, tool_name: str, input_dict: dict):
+        self.call_count += 1
+        if self.call_count > MAX_TOOL_CALLS_PER_PLAN:
+            raise RuntimeError(f"Exceeded max tool calls ({MAX_TOOL_CALLS_PER_PLAN}) in solve() plan.")
+        started = self.prefetched.get(canonical_key(tool_name, input_dict))
+        if started:
+            return ToolResult.from_call_result(await started.pop(0))
+        # REAL tool call now
+        result = await self.dispatcher.call_tool(tool_name, input_dict)
+        # Lazy wrapper: result.result is parsed once; result.content[0].text still works
+        return ToolResult.from_call_result(result)
+
+    async def call_tools(self, calls: list):
+        # Batch of independent (tool_name, input_dict) pairs; each one counts towards the limit
+        calls = [tuple(call) for call in calls]
+        self.call_count += len(calls)
+        if self.call_count > MAX_TOOL_CALLS_PER_PLAN:
+            raise RuntimeError(f"Exceeded max tool calls ({MAX_TOOL_CALLS_PER_PLAN}) in solve() plan.")
+        # Runs concurrently, results come back in the same order as calls
+        results = await self.dispatcher.call_tools(calls)
+        return [ToolResult.from_call_result(result) for result in results]
+
+
+def format_sandbox_result(result: Any) -> str:
+    # Clean result formatting
+    if isinstance(result, dict) and "result" in result:
+        return f"{result['result']}"
+    elif isinstance(result, dict):
+        return f"{json.dumps(result)}"
+    elif isinstance(result, list):
+        return f"{' '.join(str(r) for r in result)}"
+    else:
+        return f"{result}"
+
+
+async def execute_plan(code: str, mcp: Any) -> str:
+    """Run a solve() plan in a fresh module scope with `mcp` bound. Raises on failure."""
 
     # Create a fresh module scope
     sandbox = types.ModuleType("sandbox")
@@ -40,73 +110,65 @@ async def run_python_sandbox(code: str, dispatcher: Any) -> str:
     # If a variable is defined inside sandbox can it not be accessed outside? -> Correct, variables defined inside the sandbox module will not be accessible outside of it unless explicitly exposed. This isolation helps prevent unintended interactions with other parts of the program.
     # How are guardrails implemented here? -> Guardrails can be implemented by restricting the available built-ins and modules within the sandbox environment, limiting resource usage (like CPU and memory), and monitoring the execution for potentially harmful operations. In this code, the limitation on tool calls is one such guardrail.
 
-    try:
-        # Patch MCP client with real dispatcher
-        # What is a dispatcher here? -> The dispatcher is an object responsible for managing and routing tool calls to the appropriate MCP (Multi-Client Proxy) servers. It acts as an intermediary that handles communication between the sandboxed code and the external services or tools that the code may need to interact with.
-        class SandboxMCP:
-            def __init__(self, dispatcher):
-                self.dispatcher = dispatcher
-                self.call_count = 0
-
-            async def call_tool(self, tool_name: str, input_dict: dict):
-                self.call_count += 1
-                if self.call_count > MAX_TOOL_CALLS_PER_PLAN:
-                    raise RuntimeError(f"Exceeded max tool calls ({MAX_TOOL_CALLS_PER_PLAN}) in solve() plan.")
-                # REAL tool call now
-                result = await self.dispatcher.call_tool(tool_name, input_dict)
-                return result
-
-        sandbox.mcp = SandboxMCP(dispatcher)
-        # Is this a definition or an instantiation? -> This line is an instantiation. It creates a new instance of the SandboxMCP class, passing the dispatcher object to its constructor, and assigns it to the mcp attribute of the sandbox module.
-        # So everything in dispatcher is now accessible via sandbox.mcp? -> Not everything, but the methods and attributes defined in the SandboxMCP class are accessible via sandbox.mcp. The dispatcher object is encapsulated within the SandboxMCP instance, allowing controlled access to its functionality through the methods provided by SandboxMCP.
-        # What methods are available in sandbox.mcp? -> The only method available in sandbox.mcp is call_tool, which allows the sandboxed code to make tool calls while enforcing the maximum call limit.
-
-        # Preload safe built-ins into the sandbox
-        import json, re 
-        sandbox.__dict__["json"] = json 
-        sandbox.__dict__["re"] = re
-
-        # Execute solve fn dynamically
-        exec(compile(code, "<solve_plan>", "exec"), sandbox.__dict__)
-        # Give an example of the code generated?
-        # Example of code: 
-        # async def solve():
-        #    #     response = await mcp.call_tool("data_analysis_tool", {"data": "sample data"})
-        # What would sandbox.__dict__ contain here? -> sandbox.__dict__ would contain all the variables, functions, and classes defined in the dynamically executed code. This includes the solve() function that is expected to be defined in the provided code string.
-
-        solve_fn = sandbox.__dict__.get("solve")
-        # What does .get do here? -- would raise KeyError if missing. 
-        # .get lets you avoid KeyError and get None instead
-        
-
-        if solve_fn is None:
-            raise ValueError("No solve() function found in plan.")
-        # Does this break the loop?
-
-        if asyncio.iscoroutinefunction(solve_fn): 
-        # Why asyncio? - 
-        # What does iscoroutinefunction do?
-        # It checks if the provided function is a coroutine function, meaning it is defined with async def and returns a coroutine object when called. This is important for determining whether to await the function call.
-            result = await solve_fn()
-        else:
-            result = solve_fn()
-            # Then even bother writing await before?
-
-        # Clean result formatting
-        if isinstance(result, dict) and "result" in result:
-            return f"{result['result']}"
-        elif isinstance(result, dict):
-            return f"{json.dumps(result)}"
-        elif isinstance(result, list):
-            return f"{' '.join(str(r) for r in result)}"
-        else:
-            return f"{result}"
+    sandbox.mcp = mcp
+
+    # Preload safe built-ins into the sandbox
+    import json, re 
+    sandbox.__dict__["json"] = json 
+    sandbox.__dict__["re"] = re
+
+    # Execute solve fn dynamically
+    exec(compile_plan(code), sandbox.__dict__)  # compiled once per plan text (see plan_analysis.py)
+    # Give an example of the code generated?
+    # Example of code: 
+    # async def solve():
+    #    #     response = await mcp.call_tool("data_analysis_tool", {"data": "sample data"})
+    # What would sandbox.__dict__ contain here? -> sandbox.__dict__ would contain all the variables, functions, and classes defined in the dynamically executed code. This includes the solve() function that is expected to be defined in the provided code string.
+
+    solve_fn = sandbox.__dict__.get("solve")
+    # What does .get do here? -- would raise KeyError if missing. 
+    # .get lets you avoid KeyError and get None instead
+    
 
+    if solve_fn is None:
+        raise ValueError("No solve() function found in plan.")
+    # Does this break the loop?
 
+    if asyncio.iscoroutinefunction(solve_fn): 
+    # Why asyncio? - 
+    # What does iscoroutinefunction do?
+    # It checks if the provided function is a coroutine function, meaning it is defined with async def and returns a coroutine object when called. This is important for determining whether to await the function call.
+        result = await solve_fn()
+    else:
+        result = solve_fn()
+        # Then even bother writing await before?
 
+    return format_sandbox_result(result)
 
 
+async def run_python_sandbox(code: str, dispatcher: Any, pool: Optional[Any] = None) -> str:
+    print("[action] 🔍 Entered run_python_sandbox()")
+
+    mcp = SandboxMCP(dispatcher)
+    # Is this a definition or an instantiation? -> This line is an instantiation. It creates a new instance of the SandboxMCP class, passing the dispatcher object to its constructor, and assigns it to the mcp attribute of the sandbox module.
+    # So everything in dispatcher is now accessible via sandbox.mcp? -> Not everything, but the methods and attributes defined in the SandboxMCP class are accessible via sandbox.mcp. The dispatcher object is encapsulated within the SandboxMCP instance, allowing controlled access to its functionality through the methods provided by SandboxMCP.
+    # What methods are available in sandbox.mcp? -> call_tool for a single call and call_tools for a batch of independent calls; both enforce the maximum call limit.
+
+    try:
+        # Calls that do not depend on earlier results start now, concurrently, instead of one by one
+        independent = independent_tool_calls(code, limit=MAX_TOOL_CALLS_PER_PLAN)
+        if independent:
+            started = mcp.prefetch(independent)
+            if started:
+                log("sandbox", f"⚡ Prefetched {started} independent tool calls")
+
+        if pool is not None:
+            # Runs in a pre-warmed worker process (see sandbox_pool.py); its tool calls come back to `mcp` here
+            return await pool.run(code, mcp)
+        return await execute_plan(code, mcp)
 
     except Exception as e:
         log("sandbox", f"⚠️ Execution error: {e}")
         return f"[sandbox error: {str(e)}]"
+    finally:
+        mcp.cancel_prefetch()
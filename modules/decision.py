@@ -1,8 +1,10 @@
-from typing import List, Optional
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 from modules.perception import PerceptionResult
 from modules.memory import MemoryItem
-from modules.model_manager import ModelManager
+from modules.model_manager import get_model_manager
 from modules.tools import load_prompt
+from modules.prompt_builder import build_prompt, PromptSection
 import re
 
 # Optional logging fallback
@@ -14,7 +16,18 @@ except ImportError:
         now = datetime.datetime.now().strftime("%H:%M:%S")
         print(f"[{now}] [{stage}] {msg}")
 
-model = ModelManager()
+model = get_model_manager(role="planning")
+
+# Recent plans → the (prompt, attempt) they were generated from, so a plan that fails can be evicted
+_plan_sources: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+MAX_PLAN_SOURCES = 256
+
+
+def forget_plan(plan: str):
+    """Evict a failed plan's LLM response, so the next session with the same prompt gets a fresh one."""
+    source = _plan_sources.pop(plan, None)
+    if source is not None:
+        model.forget(*source)
 
 
 # prompt_path = "prompts/decision_prompt.txt"
@@ -27,23 +40,31 @@ async def generate_plan(
     prompt_path: str,
     step_num: int = 1,
     max_steps: int = 3,
+    use_cache: bool = True,
+    attempt: int = 0,
 ) -> str:
 
     """Generates the full solve() function plan for the agent."""
 
-    memory_texts = "\n".join(f"- {m.text}" for m in memory_items) or "None"
+    # Most recent tool outputs first: these are what a re-plan needs to see
+    memory_texts = "\n".join(
+        f"- {m.text}" for m in reversed(memory_items) if m.type == "tool_output"
+    ) or "None"
 
     prompt_template = load_prompt(prompt_path)
 
-    prompt = prompt_template.format(
-        tool_descriptions=tool_descriptions,
-        user_input=user_input
-    )
+    # Budget order: the query is never cut, then relevant memory, then tools (which keep a floor)
+    prompt = build_prompt("planning", prompt_template, [
+        PromptSection(name="user_input", text=user_input, required=True),
+        PromptSection(name="memory_texts", text=memory_texts, priority=1, split_lines=True),
+        PromptSection(name="tool_descriptions", text=tool_descriptions or "", priority=2, min_tokens=600, split_lines=True),
+    ])
 
 
     try:
-        raw = (await model.generate_text(prompt)).strip()
+        raw = (await model.generate_text(prompt, use_cache=use_cache, attempt=attempt)).strip()
         log("plan", f"LLM output: {raw}")
+        source = (prompt, attempt)
 
         # If fenced in ```python ... ```, extract
         if raw.startswith("```"):
@@ -52,9 +73,14 @@ async def generate_plan(
                 raw = raw[len("python"):].strip()
 
         if re.search(r"^\s*(async\s+)?def\s+solve\s*\(", raw, re.MULTILINE):
+            _plan_sources[raw] = source
+            _plan_sources.move_to_end(raw)
+            while len(_plan_sources) > MAX_PLAN_SOURCES:
+                _plan_sources.popitem(last=False)
             return raw  # ✅ Correct, it's a full function
         else:
             log("plan", "⚠️ LLM did not return a valid solve(). Defaulting to FINAL_ANSWER")
+            model.forget(*source)  # never serve this answer again
             return "FINAL_ANSWER: [Could not generate valid solve()]"
 
     except Exception as e:
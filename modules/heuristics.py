@@ -1,6 +1,7 @@
 # heuristics.py 
 import re
-import time
+import random
+import asyncio
 from typing import List, Dict, Any, Optional
 
 # ----------------------------
@@ -91,17 +92,16 @@ def contains_unsafe_link(text: str) -> bool:
             return True
     return False
 
-def handle_overload_and_retry(self, details: Dict[str, Any]) -> Dict[str, Any]:
+async def handle_overload_and_retry(details: Dict[str, Any]) -> Dict[str, Any]:
         """
         If model_overload details present, perform the pause and return status.
-        (Synchronous sleep — call from orchestrator if you want active waiting.)
+        Async, jittered sleep so other sessions keep running while this one waits.
         """
         overload = details.get("model_overload")
         if not overload:
             return {"Overload": False}
-        pause = overload.get("pause_seconds", 20)
-        # perform the sleep/pause in-place
-        time.sleep(pause)
+        pause = overload.get("pause_seconds", 20) * random.uniform(0.5, 1.5)
+        await asyncio.sleep(pause)
         return {"Overload": True, "paused_seconds": pause}
 
 
@@ -0,0 +1,121 @@
+# modules/llm_cache.py
+
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+from typing import Optional, Any, Dict
+
+DEFAULT_CACHE_PATH = "cache/llm_responses.sqlite"
+DEFAULT_MAX_ENTRIES = 5000
+
+# Cache modes:
+# off        -> never read or write
+# read_write -> serve hits, store misses (default)
+# record     -> always call the LLM and store the response (builds a benchmark fixture)
+# replay     -> only serve from the cache; a miss is an error, the LLM is never called
+MODES = ("off", "read_write", "record", "replay")
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when a prompt has no recorded response."""
+
+
+def cache_key(model_key: str, options: Optional[Dict[str, Any]], prompt: str, attempt: int = 0) -> str:
+    # A retry (attempt > 0) is a different question from the first try: it gets its own entry
+    head = {"model": model_key, "options": options or {}}
+    if attempt:
+        head["attempt"] = attempt
+    payload = json.dumps(head, sort_keys=True)
+    digest = hashlib.sha256(payload.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Content-addressed LLM response store backed by SQLite.
+    Keyed by model key + generation options + prompt hash; evicts least-recently-used
+    rows once `max_entries` is exceeded.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES, mode: str = "read_write"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}', expected one of {MODES}")
+        self.mode = mode
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.discarded = 0
+        self.db: Optional[sqlite3.Connection] = None
+        if mode != "off":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(path)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created_at REAL, last_access REAL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+            self.db.commit()
+
+    @property
+    def readable(self) -> bool:
+        return self.mode in ("read_write", "replay")
+
+    @property
+    def writable(self) -> bool:
+        return self.mode in ("read_write", "record")
+
+    def get(self, key: str) -> Optional[str]:
+        if self.db is None or not self.readable:
+            return None
+        row = self.db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            if self.mode == "replay":
+                raise ReplayMissError(f"No recorded LLM response for prompt {key[:12]}… (replay mode)")
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return row[0]
+
+    def put(self, key: str, model_key: str, response: str):
+        if self.db is None or not self.writable:
+            return
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, model_key, response, now, now),
+        )
+        self._evict()
+        self.db.commit()
+
+    def discard(self, key: str):
+        """Drop a response that turned out to be bad. Recorded fixtures (record/replay) are never edited."""
+        if self.db is None or self.mode != "read_write":
+            return
+        self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self.db.commit()
+        self.discarded += 1
+
+    def _evict(self):
+        (count,) = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "discarded": self.discarded,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
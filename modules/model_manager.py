@@ -1,16 +1,79 @@
 import os
-import json
-import yaml
-import requests
-from pathlib import Path
-from google import genai
+import time
+import httpx
+import random
+import asyncio
+from collections import deque
+from typing import Optional, List
 from dotenv import load_dotenv
+from core.config import get_profile, get_models_config
+from modules.llm_cache import LLMResponseCache, ReplayMissError, cache_key, DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES
+from modules.heuristics import detect_model_overload
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
 
 load_dotenv()
 
-ROOT = Path(__file__).parent.parent
-MODELS_JSON = ROOT / "config" / "models.json"
-PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+# Gemini clients are built on first use (the SDK import alone is slow), one per API key
+_genai_clients: dict = {}
+
+def get_genai_client(api_key_env: str = "GEMINI_API_KEY"):
+    api_key = os.getenv(api_key_env)
+    if api_key not in _genai_clients:
+        from google import genai
+        _genai_clients[api_key] = genai.Client(api_key=api_key)
+    return _genai_clients[api_key]
+
+# One pooled async HTTP client for every ModelManager, so Ollama calls reuse
+# keep-alive connections and never block the event loop.
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(300.0, connect=10.0),  # local models can take minutes on long prompts
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        )
+    return _http_client
+
+# Response caches are shared per SQLite file across ModelManager instances
+_llm_caches: dict = {}
+
+def get_llm_cache(cache_config: Optional[dict]) -> LLMResponseCache:
+    cache_config = cache_config or {}
+    path = cache_config.get("path", DEFAULT_CACHE_PATH)
+    if path not in _llm_caches:
+        _llm_caches[path] = LLMResponseCache(
+            path=path,
+            max_entries=cache_config.get("max_entries", DEFAULT_MAX_ENTRIES),
+            mode=cache_config.get("mode", "read_write"),
+        )
+    return _llm_caches[path]
+
+def llm_cache_stats() -> dict:
+    return {path: cache.stats() for path, cache in _llm_caches.items()}
+
+QWEN_OPTIONS = {
+    "temperature": 0.7,
+    "top_p": 0.8,
+    "top_k": 20,
+    "min_p": 0,
+    "num_predict": 32768
+}
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
 
 # Objective is simple:
 # # 1. Load model configurations from models.json
@@ -20,35 +83,215 @@ PROFILE_YAML = ROOT / "config" / "profiles.yaml"
 # Where are the generate embeddings methods? -> They can be added similarly to generate_text if needed in the future.
 # But without that, we cannot use the memory module fully, right? -> Correct, without embedding generation, certain memory functionalities may be limited.
 
+# Rolling health per model key, shared by every ModelManager in the process
+_model_health: dict = {}
+
+CIRCUIT_ERROR_RATE = 0.5      # open the circuit when half of the recent calls failed...
+CIRCUIT_MIN_SAMPLES = 4       # ...over at least this many calls
+CIRCUIT_COOLDOWN = 30         # seconds an error-rate circuit stays open
+MAX_OVERLOAD_PAUSE = 300      # cap for repeated overload pauses
+BACKOFF_BASE = 1.0            # seconds; doubled per round when every model failed
+MAX_ROUNDS = 3
+
+class ModelHealth:
+    """Rolling latency and error rate for one model, plus its circuit-breaker state."""
+
+    def __init__(self, model_key: str):
+        self.model_key = model_key
+        self.latency_ewma = 0.0
+        self.outcomes = deque(maxlen=20)  # True = success
+        self.consecutive_overloads = 0
+        self.open_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def record_success(self, elapsed: float):
+        self.outcomes.append(True)
+        self.consecutive_overloads = 0
+        self.latency_ewma = elapsed if self.latency_ewma == 0 else 0.8 * self.latency_ewma + 0.2 * elapsed
+
+    def record_failure(self, error: Exception):
+        self.outcomes.append(False)
+        overload = detect_model_overload(str(error))
+        if overload:
+            # Overloaded / 503: stop sending traffic for the suggested pause, doubling on repeats
+            self.consecutive_overloads += 1
+            pause = min(overload["pause_seconds"] * 2 ** (self.consecutive_overloads - 1), MAX_OVERLOAD_PAUSE)
+            self.open_until = time.monotonic() + pause
+            log("llm", f"⚠️ {self.model_key} overloaded — circuit open for {pause}s")
+        elif len(self.outcomes) >= CIRCUIT_MIN_SAMPLES and self.error_rate() >= CIRCUIT_ERROR_RATE:
+            self.open_until = time.monotonic() + CIRCUIT_COOLDOWN
+            log("llm", f"⚠️ {self.model_key} error rate {self.error_rate():.0%} — circuit open for {CIRCUIT_COOLDOWN}s")
+
+    def stats(self) -> dict:
+        return {
+            "available": self.available,
+            "latency_ms": round(self.latency_ewma * 1000, 1),
+            "error_rate": round(self.error_rate(), 3),
+        }
+
+def get_model_health(model_key: str) -> ModelHealth:
+    if model_key not in _model_health:
+        _model_health[model_key] = ModelHealth(model_key)
+    return _model_health[model_key]
+
+def model_health_stats() -> dict:
+    return {key: health.stats() for key, health in _model_health.items()}
+
+_warned_unknown_models: set = set()
+
+def known_model_keys(keys: List[str], models: dict) -> List[str]:
+    """Keys present in models.json; a routed key missing there is dropped (warned about once)."""
+    for key in keys:
+        if key not in models and key not in _warned_unknown_models:
+            _warned_unknown_models.add(key)
+            log("llm", f"⚠️ Model '{key}' is routed in profiles.yaml but not defined in models.json; skipping it")
+    return [key for key in keys if key in models]
+
 class ModelManager:
-    def __init__(self):
-        self.config = json.loads(MODELS_JSON.read_text())
-        self.profile = yaml.safe_load(PROFILE_YAML.read_text())
+    """
+    Text generation across the models in models.json.
+    `role` (e.g. "perception", "planning") picks an ordered model list from
+    llm.routing in profiles.yaml; without a route the llm.text_generation model is used.
+    Calls fail over down the list, skipping models whose circuit is open.
+    """
+
+    def __init__(self, role: Optional[str] = None):
+        # Construction is free: config comes from the shared registry on each use
+        # (so edits to profiles.yaml / models.json apply live) and clients are lazy.
+        self.role = role
+
+    @property
+    def config(self) -> dict:
+        return get_models_config()
+
+    @property
+    def profile(self) -> dict:
+        return get_profile()
+
+    @property
+    def model_keys(self) -> List[str]:
+        llm_config = self.profile["llm"]
+        routes = llm_config.get("routing") or {}
+        route = known_model_keys(routes.get(self.role) or [], self.config["models"])
+        return route or [llm_config["text_generation"]]
+
+    @property
+    def latency_budget(self) -> Optional[float]:
+        return (self.profile["llm"].get("latency_budget_s") or {}).get(self.role)
+
+    # Primary model (kept for callers that inspect it)
+    @property
+    def text_model_key(self) -> str:
+        return self.model_keys[0]
+
+    @property
+    def model_info(self) -> dict:
+        return self.config["models"][self.text_model_key]
+
+    @property
+    def model_type(self) -> str:
+        return self.model_info["type"]
+
+    @property
+    def cache(self) -> LLMResponseCache:
+        return get_llm_cache(self.profile["llm"].get("cache"))
+
+    @property
+    def embedding_model_key(self) -> str:
+        return self.profile["llm"].get("embedding") or self.config["defaults"]["embedding"]
+
+    def generation_options(self, model_key: str) -> dict:
+        """Options that change the output for the same prompt; part of the cache key."""
+        if self.config["models"][model_key]["type"] == "qwen":
+            return QWEN_OPTIONS
+        return {}
 
-        self.text_model_key = self.profile["llm"]["text_generation"]
-        self.model_info = self.config["models"][self.text_model_key]
-        self.model_type = self.model_info["type"]
+    def route(self) -> List[str]:
+        """
+        Models to try, in order: configured priority, but models with an open circuit are
+        skipped and models slower than the role's latency budget are tried last.
+        """
+        available = [key for key in self.model_keys if get_model_health(key).available]
+        budget = self.latency_budget
+        if budget:
+            available.sort(key=lambda key: get_model_health(key).latency_ewma > budget)
+        return available
 
-        # ✅ Gemini initialization (your style)
-        if self.model_type == "gemini":
-            api_key = os.getenv("GEMINI_API_KEY")
-            self.client = genai.Client(api_key=api_key)
+    async def generate_text(self, prompt: str, use_cache: bool = True, attempt: int = 0) -> str:
+        """
+        Generate text for the prompt, served from the response cache when possible.
+        `attempt` > 0 marks a retry after a bad answer: it is cached under its own key, so
+        the retry neither gets the first answer back nor overwrites it. use_cache=False
+        forces a fresh generation (stored over the old one); it has no effect in the
+        record/replay cache modes, which must stay deterministic.
+        """
+        last_error: Optional[Exception] = None
+        for round_num in range(MAX_ROUNDS):
+            for model_key in self.route():
+                try:
+                    return await self._generate_with(model_key, prompt, use_cache, attempt)
+                except ReplayMissError:
+                    raise
+                except Exception as e:
+                    last_error = e
+                    get_model_health(model_key).record_failure(e)
+                    log("llm", f"⚠️ {model_key} failed ({e}); failing over")
 
-    async def generate_text(self, prompt: str) -> str:
-        if self.model_type == "gemini":
-            return self._gemini_generate(prompt)
+            # Every model failed or is open: back off without blocking the event loop
+            delay = BACKOFF_BASE * 2 ** round_num * random.uniform(0.5, 1.5)
+            log("llm", f"⏳ No model available for role={self.role}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
 
-        elif self.model_type == "ollama":
-            return self._ollama_generate(prompt)
+        raise RuntimeError(f"All models failed for role={self.role}: {last_error}")
+
+    async def _generate_with(self, model_key: str, prompt: str, use_cache: bool, attempt: int = 0) -> str:
+        key = cache_key(model_key, self.generation_options(model_key), prompt, attempt)
+        if use_cache or self.cache.mode == "replay":
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        started = time.monotonic()
+        response = await self._generate(self.config["models"][model_key], prompt)
+        get_model_health(model_key).record_success(time.monotonic() - started)
+
+        self.cache.put(key, model_key, response)  # no-op unless the cache mode stores responses
+        return response
+
+    def forget(self, prompt: str, attempt: int = 0):
+        """Evict a cached response that proved bad (e.g. a plan that failed), for every routed model."""
+        models = self.config["models"]
+        for model_key in self.model_keys:
+            if model_key not in models:
+                continue  # never generated with, so nothing cached under it
+            self.cache.discard(cache_key(model_key, self.generation_options(model_key), prompt, attempt))
+
+    async def _generate(self, model_info: dict, prompt: str) -> str:
+        model_type = model_info["type"]
+        if model_type == "gemini":
+            return await self._gemini_generate(model_info, prompt)
+
+        elif model_type == "ollama":
+            return await self._ollama_generate(model_info, prompt)
         
-        elif self.model_type == "qwen":
-            return self._qwen_generate(prompt)
+        elif model_type == "qwen":
+            return await self._qwen_generate(model_info, prompt)
 
-        raise NotImplementedError(f"Unsupported model type: {self.model_type}")
+        raise NotImplementedError(f"Unsupported model type: {model_type}")
 
-    def _gemini_generate(self, prompt: str) -> str:
-        response = self.client.models.generate_content(
-            model=self.model_info["model"],
+    async def _gemini_generate(self, model_info: dict, prompt: str) -> str:
+        # client.aio is the SDK's native async client, so other sessions keep running while we wait
+        client = get_genai_client(model_info.get("api_key_env", "GEMINI_API_KEY"))
+        response = await client.aio.models.generate_content(
+            model=model_info["model"],
             contents=prompt
         )
 
@@ -61,32 +304,52 @@ class ModelManager:
             except Exception:
                 return str(response)
 
-    def _ollama_generate(self, prompt: str) -> str:
-        response = requests.post(
-            self.model_info["url"]["generate"],
-            json={"model": self.model_info["model"], "prompt": prompt, "stream": False}
+    async def _ollama_generate(self, model_info: dict, prompt: str) -> str:
+        response = await get_http_client().post(
+            model_info["url"]["generate"],
+            json={"model": model_info["model"], "prompt": prompt, "stream": False}
         )
         response.raise_for_status()
         return response.json()["response"].strip()
     
-    def _qwen_generate(self, prompt: str) -> str:
+    async def _qwen_generate(self, model_info: dict, prompt: str) -> str:
         payload = {
-            "model": self.model_info["model"],
+            "model": model_info["model"],
             "prompt": prompt,
             "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "top_p": 0.8,
-                "top_k": 20,
-                "min_p": 0,
-                "num_predict": 32768
-            }
+            "options": QWEN_OPTIONS
         }
 
-        response = requests.post(
-            self.model_info["url"]["generate"],
+        response = await get_http_client().post(
+            model_info["url"]["generate"],
             json=payload
         )
         response.raise_for_status()
         return response.json()["response"].strip()
 
+    async def embed(self, text: str) -> List[float]:
+        """Embedding vector for the text, from the llm.embedding model."""
+        model_info = self.config["models"][self.embedding_model_key]
+        if model_info["type"] == "gemini":
+            client = get_genai_client(model_info.get("api_key_env", "GEMINI_API_KEY"))
+            response = await client.aio.models.embed_content(
+                model=model_info["embedding_model"],
+                contents=text
+            )
+            return list(response.embeddings[0].values)
+
+        response = await get_http_client().post(
+            model_info["url"]["embed"],
+            json={"model": model_info.get("embedding_model", model_info["model"]), "prompt": text}
+        )
+        response.raise_for_status()
+        return response.json()["embedding"]
+
+
+# One ModelManager per role for the whole process
+_managers: dict = {}
+
+def get_model_manager(role: Optional[str] = None) -> ModelManager:
+    if role not in _managers:
+        _managers[role] = ModelManager(role=role)
+    return _managers[role]
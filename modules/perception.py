@@ -2,8 +2,9 @@
 
 from typing import List, Optional
 from pydantic import BaseModel
-from modules.model_manager import ModelManager
+from modules.model_manager import get_model_manager
 from modules.tools import load_prompt, extract_json_block
+from modules.prompt_builder import build_prompt, PromptSection
 from core.context import AgentContext
 
 import json
@@ -18,7 +19,7 @@ except ImportError:
         now = datetime.datetime.now().strftime("%H:%M:%S")
         print(f"[{now}] [{stage}] {msg}")
 
-model = ModelManager() # Does this call instantiate a model manager object? -> Yes, it creates an instance of the ModelManager class.
+model = get_model_manager(role="perception") # Does this call instantiate a model manager object? -> Only the first time; every module asking for the same role shares one instance.
 # Why not call modelmanager.initialize()? -> It might be that the initialization is handled within the ModelManager's constructor (__init__ method), so calling ModelManager() is sufficient to set it up.
 # Got it. So model is now an instance of ModelManager that we can use to generate text.
 
@@ -58,10 +59,10 @@ async def extract_perception(user_input: str, mcp_server_descriptions: dict) ->
     prompt_template = load_prompt(prompt_path)
     
 
-    prompt = prompt_template.format(
-        servers_text=servers_text, #example: "- server1: Description of server 1\n- server2: Description of server 2"
-        user_input=user_input #Example: "I need to analyze customer feedback data and generate a report."
-    )
+    prompt = build_prompt("perception", prompt_template, [
+        PromptSection(name="user_input", text=user_input, required=True), #Example: "I need to analyze customer feedback data and generate a report."
+        PromptSection(name="servers_text", text=servers_text, priority=1, split_lines=True), #example: "- server1: Description of server 1\n- server2: Description of server 2"
+    ])
     
 
     try:
@@ -111,9 +112,24 @@ async def run_perception(context: AgentContext, user_input: Optional[str] = None
 
     """
     Clean wrapper to call perception from context.
+    Tries the local server router first; the LLM only runs when it is not confident.
     """
+    user_input = user_input or context.user_input
+    router = getattr(context, "server_router", None)
+    if router:
+        decision = await router.route(user_input)
+        if decision:
+            log("perception", f"⚡ Fast path: {decision.servers} ({decision.source}, confidence {decision.confidence:.2f})")
+            return PerceptionResult(
+                intent="routed locally",
+                entities=[],
+                tool_hint=decision.tool_hint,
+                tags=["fast_path", decision.source],
+                selected_servers=decision.servers,
+            )
+
     return await extract_perception(
-        user_input = user_input or context.user_input, # Is or a fall back option? --> Yes, it acts as a fallback. If user_input is provided (not None), it will be used; otherwise, context.user_input will be used.
+        user_input = user_input, # Is or a fall back option? --> Yes, it acts as a fallback. If user_input is provided (not None), it will be used; otherwise, context.user_input will be used.
         mcp_server_descriptions=context.mcp_server_descriptions
     )
 
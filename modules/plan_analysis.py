@@ -0,0 +1,264 @@
+# modules/plan_analysis.py
+
+import ast
+import copy
+from functools import lru_cache
+from typing import List, Optional, Any, Dict, Iterator, Tuple
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+# Statements whose bodies run conditionally or repeatedly; calls inside them are never prefetched
+BRANCHING = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.Try, ast.With, ast.AsyncWith, ast.Match)
+SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+          ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+_UNRESOLVED = object()
+
+# JSON schema type → AST node kinds that can never satisfy it (pydantic coerces the rest, e.g. "5" → 5)
+_INCOMPATIBLE = {
+    "object": (ast.List, ast.Tuple, ast.Set, ast.Constant),
+    "array": (ast.Dict, ast.Constant),
+    "string": (ast.Dict, ast.List, ast.Tuple, ast.Set),
+    "integer": (ast.Dict, ast.List, ast.Tuple, ast.Set),
+    "number": (ast.Dict, ast.List, ast.Tuple, ast.Set),
+    "boolean": (ast.Dict, ast.List, ast.Tuple, ast.Set),
+}
+
+
+@lru_cache(maxsize=128)
+def parse_plan(code: str) -> ast.Module:
+    """Parsed plan, shared by every analysis of the same text. Callers must not mutate the tree."""
+    return ast.parse(code)
+
+
+@lru_cache(maxsize=128)
+def compile_plan(code: str):
+    """Compiled plan; a reused or retried plan is compiled once per process."""
+    return compile(code, "<solve_plan>", "exec")
+
+
+def find_solve(tree: ast.Module) -> Optional[ast.AST]:
+    return next(
+        (node for node in tree.body
+         if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == "solve"),
+        None,
+    )
+
+
+def _walk_same_scope(node: ast.AST) -> Iterator[ast.AST]:
+    """ast.walk that does not descend into nested functions, lambdas or comprehensions."""
+    yield node
+    for child in ast.iter_child_nodes(node):
+        if not isinstance(child, SCOPES):
+            yield from _walk_same_scope(child)
+
+
+def tool_call_nodes(node: ast.AST, method: str = "call_tool") -> Iterator[ast.Call]:
+    """Every `mcp.call_tool(...)` (or `mcp.<method>(...)`) call under node, in the current scope."""
+    for child in _walk_same_scope(node):
+        if (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                and child.func.attr == method
+                and isinstance(child.func.value, ast.Name) and child.func.value.id == "mcp"):
+            yield child
+
+
+def batch_items(call: ast.Call, constants: Dict[str, Any]) -> List[Tuple[ast.AST, Optional[ast.AST]]]:
+    """
+    (tool name, input dict) argument nodes of each literal (tool, args) pair in a
+    `mcp.call_tools([...])` batch. Items built at run time are skipped.
+    """
+    batch = call.args[0] if call.args else next((k.value for k in call.keywords if k.arg == "calls"), None)
+    if isinstance(batch, ast.Name) and batch.id in constants:
+        batch = ast.parse(repr(constants[batch.id]), mode="eval").body
+    if not isinstance(batch, (ast.List, ast.Tuple)):
+        return []
+    return [
+        (item.elts[0], item.elts[1])
+        for item in batch.elts
+        if isinstance(item, (ast.List, ast.Tuple)) and len(item.elts) == 2
+    ]
+
+
+def call_arguments(call: ast.Call) -> Tuple[Optional[ast.AST], Optional[ast.AST]]:
+    """The (tool name, input dict) argument nodes of a call_tool call, positional or keyword."""
+    args = list(call.args[:2]) + [None] * (2 - len(call.args[:2]))
+    for keyword in call.keywords:
+        if keyword.arg == "tool_name":
+            args[0] = keyword.value
+        elif keyword.arg == "input_dict":
+            args[1] = keyword.value
+    return args[0], args[1]
+
+
+def _touched_names(stmt: ast.AST) -> set:
+    """Names a statement may rebind or mutate: assignment targets and objects it calls methods on or indexes."""
+    names = set()
+    for node in _walk_same_scope(stmt):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.Attribute, ast.Subscript)) and isinstance(node.value, ast.Name):
+            names.add(node.value.id)  # x.append(...), x["k"] = ...
+    return names
+
+
+def resolve_literal(node: Optional[ast.AST], constants: Dict[str, Any]) -> Any:
+    """Value of node if it is a literal built only from constants known at this point, else _UNRESOLVED."""
+    if node is None:
+        return _UNRESOLVED
+
+    class Substitute(ast.NodeTransformer):
+        def visit_Name(self, name):
+            if name.id in constants:
+                return ast.parse(repr(constants[name.id]), mode="eval").body
+            return name
+
+    try:
+        expression = ast.Expression(body=copy.deepcopy(node))  # the transformer rewrites in place
+        return ast.literal_eval(Substitute().visit(expression).body)
+    except (ValueError, TypeError, SyntaxError, RecursionError):
+        return _UNRESOLVED
+
+
+def independent_tool_calls(code: str, limit: int) -> List[Tuple[str, dict]]:
+    """
+    call_tool invocations in solve() that can start before the plan runs.
+
+    A call qualifies when it sits in straight-line code of solve() (not inside an
+    if/loop/try, which might skip or repeat it) and its tool name and arguments are
+    literals, or names bound to literals that nothing has changed since. Anything
+    derived from an earlier result is, by construction, not a literal, so it never
+    qualifies. Scanning stops at the first statement that can leave solve() (a
+    return/raise, or a block containing one): calls after it might never run.
+    Returns [] unless at least two calls can overlap.
+    """
+    try:
+        tree = parse_plan(code)
+    except SyntaxError:
+        return []
+    solve = find_solve(tree)
+    if solve is None:
+        return []
+
+    calls: List[Tuple[str, dict]] = []
+    for stmt, constants in _statements_with_constants(solve):
+        exits = _can_exit(stmt)
+        if exits and isinstance(stmt, BRANCHING):
+            break
+        if not isinstance(stmt, BRANCHING):
+            for call in tool_call_nodes(stmt):
+                tool_node, args_node = call_arguments(call)
+                tool_name = resolve_literal(tool_node, constants)
+                arguments = resolve_literal(args_node, constants)
+                if isinstance(tool_name, str) and isinstance(arguments, dict):
+                    calls.append((tool_name, arguments))
+        if exits:
+            break  # `return await mcp.call_tool(...)`: its own call runs, nothing after it does
+
+    calls = calls[:limit]
+    return calls if len(calls) >= 2 else []
+
+
+def _can_exit(stmt: ast.AST) -> bool:
+    """True when the statement may leave solve(): a return or raise anywhere in it (same scope)."""
+    return any(isinstance(node, (ast.Return, ast.Raise)) for node in _walk_same_scope(stmt))
+
+
+def _statements_with_constants(solve: ast.AST) -> Iterator[Tuple[ast.stmt, Dict[str, Any]]]:
+    """Top-level statements of solve(), each with the names known to hold literals when it runs."""
+    constants: Dict[str, Any] = {}
+    for stmt in solve.body:
+        yield stmt, dict(constants)
+        value = _UNRESOLVED
+        if (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1
+                and isinstance(stmt.targets[0], ast.Name)):
+            value = resolve_literal(stmt.value, constants)
+        for name in _touched_names(stmt):
+            constants.pop(name, None)
+        if value is not _UNRESOLVED:
+            constants[stmt.targets[0].id] = value
+
+
+def _deref(schema: dict, defs: dict) -> dict:
+    while "$ref" in schema:
+        schema = defs.get(schema["$ref"].split("/")[-1], {})
+    return schema
+
+
+def schema_problems(node: ast.AST, schema: dict, defs: dict, path: str) -> List[str]:
+    """
+    Shape errors of an argument expression against a JSON schema: missing required keys
+    and values that can never match the declared type. Parts that are only known at run
+    time (names, calls, **spreads) are not judged.
+    """
+    schema = _deref(schema, defs)
+    expected = schema.get("type")
+    if not isinstance(expected, str):
+        return []  # anyOf / unions / untyped: leave it to the server
+    if isinstance(node, _INCOMPATIBLE.get(expected, ())):
+        return [f"{path} should be {expected}"]
+
+    problems = []
+    if expected == "object" and isinstance(node, ast.Dict):
+        if any(key is None or not isinstance(key, ast.Constant) for key in node.keys):
+            return []
+        given = {key.value: value for key, value in zip(node.keys, node.values)}
+        for key in schema.get("required", []):
+            if key not in given:
+                problems.append(f"{path} is missing required key '{key}'")
+        properties = schema.get("properties", {})
+        for key, value in given.items():
+            if key in properties:
+                problems.extend(schema_problems(value, properties[key], defs, f"{path}.{key}"))
+            elif schema.get("additionalProperties") is False:
+                problems.append(f"{path} has unexpected key '{key}'")
+    elif expected == "array" and isinstance(node, (ast.List, ast.Tuple)) and "items" in schema:
+        for index, item in enumerate(node.elts):
+            problems.extend(schema_problems(item, schema["items"], defs, f"{path}[{index}]"))
+    return problems
+
+
+def validate_plan(code: str, tool_map: Dict[str, Any]) -> List[str]:
+    """
+    Static checks before a plan is allowed to run: it parses, defines solve(), names only
+    known tools, and passes arguments shaped like each tool's inputSchema. Both single
+    calls and the literal (tool, args) pairs of `mcp.call_tools([...])` batches are
+    checked. Returns the problems found; an empty list means the plan may run.
+    """
+    try:
+        tree = parse_plan(code)
+    except SyntaxError as e:
+        return [f"syntax error at line {e.lineno}: {e.msg}"]
+    solve = find_solve(tree)
+    if solve is None:
+        return ["no solve() function defined"]
+
+    problems = []
+    known = sorted(tool_map)
+    for stmt, constants in _statements_with_constants(solve):
+        if isinstance(stmt, BRANCHING):
+            # A name rebound anywhere inside the block may already differ at the call
+            touched = _touched_names(stmt)
+            constants = {name: value for name, value in constants.items() if name not in touched}
+        pairs = [call_arguments(call) for call in tool_call_nodes(stmt)]
+        for batch in tool_call_nodes(stmt, "call_tools"):
+            pairs.extend(batch_items(batch, constants))
+        for tool_node, args_node in pairs:
+            tool_name = resolve_literal(tool_node, constants)
+            if not isinstance(tool_name, str):
+                continue  # computed at run time
+            if tool_name not in tool_map:
+                problems.append(f"unknown tool '{tool_name}' (available: {', '.join(known)})")
+                continue
+            schema = getattr(tool_map[tool_name]["tool"], "inputSchema", None) or {}
+            if args_node is not None:
+                if isinstance(args_node, ast.Name) and args_node.id in constants:
+                    args_node = ast.parse(repr(constants[args_node.id]), mode="eval").body
+                problems.extend(schema_problems(args_node, schema, schema.get("$defs", {}), tool_name))
+    return problems
@@ -0,0 +1,326 @@
+# modules/plan_cache.py
+
+import io
+import re
+import ast
+import json
+import time
+import sqlite3
+import hashlib
+import tokenize
+from pathlib import Path
+from typing import List, Optional, Any, Dict, Tuple
+from modules.memory import MemoryItem
+from modules.plan_analysis import parse_plan, call_arguments
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+DEFAULT_PLAN_CACHE_PATH = "cache/plans.sqlite"
+DEFAULT_MAX_ENTRIES = 1000
+
+# Literals that vary between otherwise identical queries, in match priority order.
+# Each becomes a typed slot in the query template.
+LITERAL_PATTERNS = [
+    ("URL", r"https?://[^\s\"']+"),
+    ("PATH", r"[A-Za-z]:\\[^\s\"']+"),
+    ("QUOTED", r"\"([^\"]+)\"|(?<!\w)'([^']+)'(?!\w)"),
+    ("NUM", r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])"),
+    ("NAME", r"\b[A-Z][A-Za-z0-9]*[A-Z0-9][A-Za-z0-9]*\b|(?<![.!?]\s)(?<!^)\b[A-Z][a-z]+\b"),  # INDIA, DLF, mid-sentence Anmol
+]
+_LITERAL_RE = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in LITERAL_PATTERNS))
+
+
+def templatize(query: str) -> Tuple[str, List[str]]:
+    """
+    Split a query into its shape and its literals:
+    'ASCII values of "INDIA"' → ('ascii values of <QUOTED>', ['INDIA']).
+    """
+    literals, parts, last = [], [], 0
+    for match in _LITERAL_RE.finditer(query):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "QUOTED":
+            value = value[1:-1]
+        parts.append(query[last:match.start()].lower())
+        parts.append(f"<{kind}>")
+        literals.append(value)
+        last = match.end()
+    parts.append(query[last:].lower())
+    template = re.sub(r"\s+", " ", "".join(parts)).strip().rstrip("?.! ")
+    return template, literals
+
+
+def catalog_hash(tools: List[Any]) -> str:
+    """Fingerprint of the tool catalog; any tool or schema change invalidates cached plans."""
+    payload = json.dumps(
+        sorted(
+            [tool.name, getattr(tool, "description", None), getattr(tool, "inputSchema", None)]
+            for tool in tools
+        ),
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _data_constants(node: ast.AST):
+    """Constants that are the value itself or sit inside dict values / list / tuple / set displays."""
+    if isinstance(node, ast.Constant):
+        yield node
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        yield from _data_constants(node.operand)
+    elif isinstance(node, ast.Dict):
+        for value in node.values:
+            yield from _data_constants(value)
+    elif isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        for element in node.elts:
+            yield from _data_constants(element)
+
+
+def _rewritable_positions(plan: str) -> set:
+    """
+    (line, column) of the literals a cached plan may have rewritten: data passed to
+    mcp.call_tool(...) and values of plain assignments. Subscripts (content[0]), range()
+    bounds and every other literal are code, not query data, and are never touched.
+    """
+    try:
+        tree = parse_plan(plan)
+    except SyntaxError:
+        return set()
+    sources = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Assign, ast.AnnAssign)) and node.value is not None:
+            sources.append(node.value)
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "call_tool"):
+            sources.append(call_arguments(node)[1])
+
+    lines = plan.splitlines()
+    positions = set()
+    for source in sources:
+        for constant in (_data_constants(source) if source is not None else ()):
+            # AST columns are UTF-8 byte offsets; tokenize columns are characters
+            line = lines[constant.lineno - 1].encode("utf-8")
+            positions.add((constant.lineno, len(line[:constant.col_offset].decode("utf-8", errors="ignore"))))
+    return positions
+
+
+def _literal_tokens(plan: str) -> List[Tuple[int, int, Any]]:
+    """(start offset, end offset, value) of every string and number literal a cached plan may rewrite."""
+    line_starts = [0]
+    for line in plan.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+    rewritable = _rewritable_positions(plan)
+
+    found = []
+    for token in tokenize.generate_tokens(io.StringIO(plan).readline):
+        if token.type not in (tokenize.STRING, tokenize.NUMBER) or token.start not in rewritable:
+            continue
+        try:
+            value = ast.literal_eval(token.string)  # f-strings and bytes are left alone
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            start = line_starts[token.start[0] - 1] + token.start[1]
+            end = line_starts[token.end[0] - 1] + token.end[1]
+            found.append((start, end, value))
+    return found
+
+
+def _as_number(literal: str) -> Optional[float]:
+    try:
+        return float(literal)
+    except ValueError:
+        return None
+
+
+def _number_kind(literal: str) -> Optional[type]:
+    """int or float for a numeric literal, None for anything else."""
+    if _as_number(literal) is None:
+        return None
+    return float if "." in literal else int
+
+
+def used_slots(plan: str, literals: List[str]) -> List[int]:
+    """
+    Indexes of the query literals that appear in the plan's rewritable literals (tool
+    arguments, assigned values). A literal that also appears where it cannot be rewritten
+    (a subscript, a range() bound, an f-string, a comment) is not counted, so the cache
+    treats it as fixed rather than half-substituting it.
+    """
+    used = set()
+    tokens = _literal_tokens(plan)
+    for _, _, value in tokens:
+        for index, literal in enumerate(literals):
+            if isinstance(value, str):
+                if re.search(rf"(?<!\w){re.escape(literal)}(?!\w)", value):
+                    used.add(index)
+            elif _as_number(literal) == value:
+                used.add(index)
+
+    rest, last = [], 0
+    for start, end, _ in tokens:
+        rest.append(plan[last:start])
+        last = end
+    rest.append(plan[last:])
+    rest = "".join(rest)
+    return sorted(i for i in used if not re.search(rf"(?<!\w){re.escape(literals[i])}(?!\w)", rest))
+
+
+def substitute(plan: str, old: List[str], new: List[str]) -> str:
+    """Rewrite the plan's literals, replacing each old query literal with the new one."""
+    mapping = {o: n for o, n in zip(old, new) if o != n}
+    if not mapping:
+        return plan
+    pattern = re.compile("|".join(rf"(?<!\w){re.escape(o)}(?!\w)" for o in sorted(mapping, key=len, reverse=True)))
+    numbers = {_as_number(o): n for o, n in mapping.items() if _as_number(o) is not None}
+
+    pieces, last = [], 0
+    for start, end, value in _literal_tokens(plan):
+        if isinstance(value, str):
+            replaced = pattern.sub(lambda m: mapping[m.group(0)], value)
+            if replaced == value:
+                continue
+            text = repr(replaced)
+        elif value in numbers and _as_number(numbers[value]) is not None:
+            text = numbers[value]
+        else:
+            continue
+        pieces.append(plan[last:start])
+        pieces.append(text)
+        last = end
+    pieces.append(plan[last:])
+    return "".join(pieces)
+
+
+class PlanCache:
+    """
+    Reuses solve() programs across queries that differ only in their literals.
+
+    A successful plan is stored under (query template, tool catalog hash) together with
+    the query's literals. A later query with the same template gets the stored plan with
+    its own literals substituted, provided every literal the plan does not use is
+    unchanged (otherwise the plan may have baked in something it should not reuse) and
+    every literal it does use keeps its kind (int, float or text).
+    """
+
+    def __init__(self, path: str = DEFAULT_PLAN_CACHE_PATH, catalog: str = "", max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.catalog = catalog
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.discarded = 0
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS plans ("
+            "id INTEGER PRIMARY KEY, key TEXT, template TEXT, literals TEXT, used TEXT, plan TEXT, last_access REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS plans_key ON plans (key)")
+        self.db.commit()
+
+    def _key(self, template: str) -> str:
+        return hashlib.sha256(f"{template}\0{self.catalog}".encode("utf-8")).hexdigest()
+
+    def lookup(self, query: str) -> Optional[str]:
+        """A ready-to-run plan for the query, or None when there is no confident match."""
+        template, literals = templatize(query)
+        rows = self.db.execute(
+            "SELECT id, literals, used, plan FROM plans WHERE key = ? ORDER BY last_access DESC",
+            (self._key(template),),
+        ).fetchall()
+
+        for row_id, stored_json, used_json, plan in rows:
+            stored, used = json.loads(stored_json), set(json.loads(used_json))
+            if len(stored) != len(literals):
+                continue
+            if any(stored[i] != literals[i] for i in range(len(stored)) if i not in used):
+                continue
+            # Two slots that shared a value must still share one, or the rewrite is ambiguous
+            if any(stored[i] == stored[j] and literals[i] != literals[j] for i in used for j in used):
+                continue
+            # 5 -> 2.5 would write a float where the plan (and its tool schema) had an int
+            if any(_number_kind(stored[i]) is not _number_kind(literals[i]) for i in used):
+                continue
+            candidate = substitute(plan, stored, literals)
+            try:
+                ast.parse(candidate)
+            except SyntaxError:
+                continue
+            self.db.execute("UPDATE plans SET last_access = ? WHERE id = ?", (time.time(), row_id))
+            self.db.commit()
+            self.hits += 1
+            log("plan", f"♻️ Plan cache hit for template '{template}'")
+            return candidate
+
+        self.misses += 1
+        return None
+
+    def store(self, query: str, plan: str):
+        template, literals = templatize(query)
+        key = self._key(template)
+        used = used_slots(plan, literals)
+        fixed = json.dumps([literal for i, literal in enumerate(literals) if i not in used])
+        # One plan per (template, fixed literals): the newest success replaces older ones
+        for row_id, stored_json, used_json in self.db.execute(
+            "SELECT id, literals, used FROM plans WHERE key = ?", (key,)
+        ).fetchall():
+            stored, stored_used = json.loads(stored_json), set(json.loads(used_json))
+            if json.dumps([s for i, s in enumerate(stored) if i not in stored_used]) == fixed:
+                self.db.execute("DELETE FROM plans WHERE id = ?", (row_id,))
+        self.db.execute(
+            "INSERT INTO plans (key, template, literals, used, plan, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, template, json.dumps(literals), json.dumps(used), plan, time.time()),
+        )
+        self._evict()
+        self.db.commit()
+        self.stored += 1
+
+    def store_from_memory(self, query: str, items: List[MemoryItem]) -> bool:
+        """Store the plan of the session's latest successful solve_sandbox run, if any."""
+        for item in reversed(items):
+            if item.type == "tool_output" and item.tool_name == "solve_sandbox":
+                if item.success and item.tool_args and item.tool_args.get("plan"):
+                    self.store(query, item.tool_args["plan"])
+                    return True
+                return False
+        return False
+
+    def discard(self, query: str, plan: str):
+        """Drop a cached plan that failed when reused."""
+        template, literals = templatize(query)
+        rows = self.db.execute("SELECT id, literals, plan FROM plans WHERE key = ?", (self._key(template),)).fetchall()
+        for row_id, stored_json, stored_plan in rows:
+            if substitute(stored_plan, json.loads(stored_json), literals) == plan:
+                self.db.execute("DELETE FROM plans WHERE id = ?", (row_id,))
+                self.discarded += 1
+        self.db.commit()
+
+    def _evict(self):
+        (count,) = self.db.execute("SELECT COUNT(*) FROM plans").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.db.execute(
+                "DELETE FROM plans WHERE id IN (SELECT id FROM plans ORDER BY last_access LIMIT ?)", (overflow,)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "discarded": self.discarded,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def close(self):
+        self.db.close()
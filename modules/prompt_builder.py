@@ -0,0 +1,88 @@
+# modules/prompt_builder.py
+
+import math
+from typing import List, Optional, Dict
+from pydantic import BaseModel
+from core.config import get_profile
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+CHARS_PER_TOKEN = 4  # rough average for English text and code; good enough for budgeting
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (no tokenizer call)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+class PromptSection(BaseModel):
+    """One template placeholder and the text that fills it."""
+    name: str                 # placeholder in the template, e.g. "tool_descriptions"
+    text: str
+    priority: int = 0         # lower is kept first when the budget is tight
+    min_tokens: int = 0       # floor this section keeps even when higher priorities are large
+    required: bool = False    # never trimmed (e.g. the user query)
+    split_lines: bool = False # trim by dropping whole trailing lines instead of cutting text
+
+
+def get_prompt_budget(stage: str) -> Optional[int]:
+    return (get_profile().get("prompt_budget") or {}).get(stage)
+
+
+def fit_section(section: PromptSection, max_tokens: int) -> str:
+    if estimate_tokens(section.text) <= max_tokens:
+        return section.text
+
+    if section.split_lines:
+        lines = section.text.splitlines()
+        kept, used = [], 0
+        for line in lines:
+            cost = estimate_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            kept.append(line)
+            used += cost
+        omitted = len(lines) - len(kept)
+        return "\n".join(kept + [f"- ... ({omitted} more omitted)"])
+
+    return section.text[: max(max_tokens, 0) * CHARS_PER_TOKEN].rstrip() + " … [truncated]"
+
+
+def build_prompt(stage: str, template: str, sections: List[PromptSection]) -> str:
+    """
+    Fill `template` with `sections`, keeping the result within the stage's token budget
+    (prompt_budget.<stage> in profiles.yaml). Required sections are kept whole, every
+    section keeps its min_tokens floor, and the rest of the budget goes to sections in
+    priority order. Logs the estimated token count of the final prompt.
+    """
+    budget = get_prompt_budget(stage)
+    texts: Dict[str, str] = {section.name: section.text for section in sections}
+
+    if budget:
+        sizes = {section.name: estimate_tokens(section.text) for section in sections}
+        remaining = budget - estimate_tokens(template.format(**{name: "" for name in texts}))
+
+        allocation = {}
+        for section in sections:
+            allocation[section.name] = sizes[section.name] if section.required else min(sizes[section.name], section.min_tokens)
+            remaining -= allocation[section.name]
+
+        for section in sorted(sections, key=lambda s: s.priority):
+            extra = min(sizes[section.name] - allocation[section.name], max(remaining, 0))
+            allocation[section.name] += extra
+            remaining -= extra
+
+        texts = {section.name: fit_section(section, allocation[section.name]) for section in sections}
+
+    prompt = template.format(**texts)
+    tokens = estimate_tokens(prompt)
+    budget_note = f" / budget {budget}" if budget else ""
+    log("prompt", f"{stage}: ~{tokens} tokens{budget_note}")
+    return prompt
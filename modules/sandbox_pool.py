@@ -0,0 +1,350 @@
+# modules/sandbox_pool.py
+
+import math
+import signal
+import itertools
+import json  # preloaded for plans; imported here so workers pay for it at spawn, not per plan
+import re
+import time
+import asyncio
+import multiprocessing
+from typing import Optional, Any, Dict
+
+try:
+    import resource  # POSIX only; on Windows workers run without rlimits (the wall-clock deadline still applies)
+except ImportError:
+    resource = None
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+# Worker processes are spawned, not forked: the agent holds an event loop, SQLite handles and
+# MCP sessions that must not be duplicated into a child.
+_mp = multiprocessing.get_context("spawn")
+
+
+class SandboxError(RuntimeError):
+    """A plan failed inside a worker, or the worker itself had to be stopped."""
+
+
+class WorkerDied(SandboxError):
+    """The worker process exited mid-plan (rlimit hit, crash); it must be replaced."""
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+class WorkerMCP:
+    """Stand-in for SandboxMCP inside a worker: every call is forwarded to the parent over the pipe."""
+
+    def __init__(self, events):
+        self.events = events
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.ids = itertools.count()
+
+    async def _request(self, message: dict):
+        call_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[call_id] = future
+        self.events.send({**message, "id": call_id})
+        return await future
+
+    async def call_tool(self, tool_name: str, input_dict: dict):
+        return await self._request({"type": "call", "tool": tool_name, "args": input_dict})
+
+    async def call_tools(self, calls: list):
+        return await self._request({"type": "call_batch", "calls": [tuple(call) for call in calls]})
+
+    def resolve(self, message: dict):
+        future = self.pending.pop(message["id"], None)
+        if future is None or future.done():
+            return
+        if "error" in message:
+            future.set_exception(SandboxError(message["error"]))
+        else:
+            future.set_result(message["value"])
+
+
+def _limit_cpu(cpu_seconds: Optional[int]):
+    if resource is None or not cpu_seconds:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime) + cpu_seconds  # limit counts the worker's lifetime CPU
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    # The kernel sends SIGXCPU past the soft limit, which terminates the worker; the parent replaces it
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _limit_memory(memory_mb: Optional[int]):
+    if resource is None or not memory_mb:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024, hard))
+
+
+async def _run_job(job: dict, jobs, events):
+    from modules.action import execute_plan
+
+    mcp = WorkerMCP(events)
+    loop = asyncio.get_running_loop()
+
+    async def read_replies():
+        # Tool results arrive on the jobs pipe; the parent sends "end" once it has our answer
+        while True:
+            message = await loop.run_in_executor(None, jobs.recv)
+            if message["type"] == "end":
+                return
+            mcp.resolve(message)
+
+    reader = asyncio.create_task(read_replies())
+    try:
+        result = await execute_plan(job["code"], mcp)
+        events.send({"type": "done", "result": result})
+    except BaseException as e:  # MemoryError and friends included: the worker itself stays usable
+        events.send({"type": "done", "error": str(e) or type(e).__name__})
+    await reader
+
+
+def _worker_main(jobs, events, memory_mb: Optional[int]):
+    import mcp.types  # noqa: F401  tool results are unpickled into these classes
+    import modules.action  # noqa: F401
+
+    _limit_memory(memory_mb)
+    events.send({"type": "ready"})
+    while True:
+        try:
+            job = jobs.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        _limit_cpu(job.get("cpu_seconds"))
+        asyncio.run(_run_job(job, jobs, events))
+
+
+# ---------------------------------------------------------------------------
+# Parent side
+# ---------------------------------------------------------------------------
+
+class SandboxWorker:
+    """One pre-warmed worker process and the two pipes to it."""
+
+    def __init__(self, memory_mb: Optional[int]):
+        worker_jobs, self.jobs = _mp.Pipe(duplex=False)      # parent → worker: plans and tool results
+        self.events, worker_events = _mp.Pipe(duplex=False)  # worker → parent: tool calls and answers
+        self.process = _mp.Process(
+            target=_worker_main, args=(worker_jobs, worker_events, memory_mb), daemon=True
+        )
+        self.process.start()
+        # Drop our copies of the worker's ends, so a dead worker shows up as EOF instead of a hang
+        worker_jobs.close()
+        worker_events.close()
+        self.plans = 0
+
+    async def ready(self):
+        message = await asyncio.to_thread(self.events.recv)
+        if message.get("type") != "ready":
+            raise SandboxError(f"Unexpected message from starting worker: {message}")
+
+    async def run(self, code: str, mcp: Any, cpu_seconds: Optional[int]) -> str:
+        self.plans += 1
+        calls = set()
+        try:
+            try:
+                self.jobs.send({"type": "job", "code": code, "cpu_seconds": cpu_seconds})
+            except OSError:
+                raise await self._died() from None
+            while True:
+                try:
+                    message = await asyncio.to_thread(self.events.recv)
+                except EOFError:
+                    raise await self._died() from None
+                if message["type"] in ("call", "call_batch"):
+                    task = asyncio.create_task(self._serve(message, mcp))
+                    calls.add(task)
+                    task.add_done_callback(calls.discard)
+                elif message["type"] == "done":
+                    self.jobs.send({"type": "end"})
+                    if "error" in message:
+                        raise SandboxError(message["error"])
+                    return message["result"]
+        finally:
+            for task in calls:
+                task.cancel()
+
+    async def _died(self) -> WorkerDied:
+        await asyncio.to_thread(self.process.join, 2)
+        code = self.process.exitcode
+        if code == -getattr(signal, "SIGXCPU", 0):
+            reason = "plan exceeded its CPU time limit"
+        elif code is not None and code < 0:
+            reason = f"sandbox worker killed by signal {-code}"
+        else:
+            reason = f"sandbox worker exited (code {code})"
+        return WorkerDied(reason)
+
+    async def _serve(self, message: dict, mcp: Any):
+        try:
+            if message["type"] == "call_batch":
+                value = await mcp.call_tools(message["calls"])
+            else:
+                value = await mcp.call_tool(message["tool"], message["args"])
+            reply = {"type": "result", "id": message["id"], "value": value}
+        except Exception as e:
+            reply = {"type": "result", "id": message["id"], "error": str(e)}
+        try:
+            self.jobs.send(reply)
+        except (OSError, ValueError):
+            pass  # worker already gone; run() reports that
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=2)
+        self.jobs.close()
+        self.events.close()
+
+    def stop(self):
+        try:
+            self.jobs.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=2)
+        self.kill()
+
+
+class SandboxPool:
+    """
+    Pre-warmed worker processes that run solve() plans off the agent's event loop.
+
+    Each worker has json/re and the plan runtime imported before its first plan, an
+    address-space rlimit (`memory_mb`) and a per-plan CPU rlimit (`cpu_seconds`). The
+    parent enforces a wall-clock `deadline` and replaces any worker that hits a limit,
+    dies, or has run `max_plans_per_worker` plans. Tool calls made by the plan are sent
+    back over a pipe and executed by the parent's SandboxMCP / MultiMCP.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        deadline: float = 180,
+        cpu_seconds: Optional[int] = 30,
+        memory_mb: Optional[int] = 1024,
+        max_plans_per_worker: int = 50,
+    ):
+        self.size = workers
+        self.deadline = deadline
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_plans_per_worker = max_plans_per_worker
+        self.idle: Optional[asyncio.Queue] = None
+        self.plans = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.restarts = 0
+        self.missing = 0  # workers lost to a failed respawn; spawned again before the next plan
+        self.run_total = 0.0
+
+    async def _spawn(self) -> SandboxWorker:
+        worker = await asyncio.to_thread(SandboxWorker, self.memory_mb)
+        try:
+            await worker.ready()
+        except BaseException:
+            await asyncio.to_thread(worker.kill)
+            raise
+        return worker
+
+    async def start(self):
+        self.idle = asyncio.Queue()
+        workers = await asyncio.gather(*(self._spawn() for _ in range(self.size)))
+        for worker in workers:
+            self.idle.put_nowait(worker)
+        log("sandbox", f"{self.size} sandbox workers ready")
+
+    async def _replace(self, worker: SandboxWorker) -> Optional[SandboxWorker]:
+        """A fresh worker in place of this one, or None (counted in `missing`) if spawning fails."""
+        await asyncio.to_thread(worker.kill)
+        try:
+            replacement = await self._spawn()
+        except Exception as e:
+            self.missing += 1
+            log("sandbox", f"⚠️ Could not respawn a sandbox worker ({e}); retrying before the next plan")
+            return None
+        self.restarts += 1
+        return replacement
+
+    async def _restore(self):
+        """Respawn workers lost to failed spawns, so the pool never shrinks silently."""
+        while self.missing:
+            self.missing -= 1  # claimed before the await, so concurrent plans do not over-spawn
+            try:
+                worker = await self._spawn()
+            except Exception as e:
+                self.missing += 1
+                if self.missing >= self.size:
+                    # No worker exists to wait for: fail this plan instead of hanging on the queue
+                    raise SandboxError(f"no sandbox worker available: {e}") from e
+                log("sandbox", f"⚠️ Sandbox worker respawn failed again ({e}); running with fewer workers")
+                return
+            self.restarts += 1
+            self.idle.put_nowait(worker)
+
+    async def run(self, code: str, mcp: Any) -> str:
+        if self.idle is None:
+            await self.start()
+        await self._restore()
+        worker = await self.idle.get()
+        started = time.monotonic()
+        healthy = False
+        try:
+            async with asyncio.timeout(self.deadline):
+                result = await worker.run(code, mcp, self.cpu_seconds)
+            healthy = True
+            return result
+        except TimeoutError:
+            self.timeouts += 1
+            raise SandboxError(f"plan exceeded the {self.deadline}s wall-clock deadline") from None
+        except WorkerDied:
+            self.crashes += 1
+            self.failures += 1
+            raise
+        except SandboxError:
+            healthy = True  # the plan failed, the worker is fine
+            self.failures += 1
+            raise
+        finally:
+            self.plans += 1
+            self.run_total += time.monotonic() - started
+            if not healthy or worker.plans >= self.max_plans_per_worker:
+                worker = await self._replace(worker)
+            if worker is not None:
+                self.idle.put_nowait(worker)
+
+    async def shutdown(self):
+        if self.idle is None:
+            return
+        while not self.idle.empty():
+            await asyncio.to_thread(self.idle.get_nowait().stop)
+        self.idle = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.size,
+            "plans": self.plans,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "restarts": self.restarts,
+            "missing": self.missing,
+            "avg_run_ms": round(1000 * self.run_total / self.plans, 1) if self.plans else 0.0,
+        }
@@ -0,0 +1,196 @@
+# modules/server_router.py
+
+import re
+import json
+from pathlib import Path
+from typing import List, Optional, Any, Dict, Tuple
+from pydantic import BaseModel
+from modules.model_manager import get_model_manager
+from modules.tool_index import normalize, dot
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+DEFAULT_EXAMPLES_PATH = "cache/server_examples.json"
+DEFAULT_MAX_EXAMPLES = 500
+DEFAULT_MIN_CONFIDENCE = 0.7      # below this the perception LLM decides
+DEFAULT_NEIGHBOUR_THRESHOLD = 0.9 # cosine similarity at which a past query counts as "the same question"
+MIN_KEYWORD_LENGTH = 4            # shorter capability tokens ("to", "int", "sum") match too much prose
+AGREEMENT_FLOOR = 0.75            # weakest neighbour similarity that still counts as agreeing with keywords
+
+# Words that occur in tool names but are everyday prose in queries ("list the numbers from it");
+# they never count as evidence for a server
+GENERIC_WORDS = {
+    "from", "into", "with", "list", "lists", "number", "numbers", "string", "strings", "chars",
+    "create", "make", "convert", "extract", "download", "stored", "store", "result", "results",
+    "value", "values", "text", "data", "file", "files", "info", "mine", "about", "what", "give",
+}
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class RouteDecision(BaseModel):
+    """Servers picked by the fast path, how sure it is, and why."""
+    servers: List[str]
+    confidence: float
+    source: str                     # "neighbour", "keywords" or "neighbour+keywords"
+    tool_hint: Optional[str] = None
+
+
+class ServerRouter:
+    """
+    Local server selection that runs before the perception LLM.
+
+    Two signals:
+    - keyword rules: each server's `capabilities` (and `basic_tools`) are split into words;
+      a non-generic word owned by exactly one server is evidence for it, a full tool name is
+      strong evidence. Keywords alone route only when a full tool name was matched.
+    - nearest neighbour: queries that previously led to a successful answer are stored with the
+      servers used; a new query that embeds close to one of them reuses its servers.
+
+    `route()` returns a RouteDecision only when confidence reaches `min_confidence`;
+    otherwise None and the caller asks the LLM.
+    """
+
+    def __init__(
+        self,
+        server_configs: Dict[str, dict],
+        examples_path: Optional[str] = DEFAULT_EXAMPLES_PATH,
+        max_examples: int = DEFAULT_MAX_EXAMPLES,
+        min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+        neighbour_threshold: float = DEFAULT_NEIGHBOUR_THRESHOLD,
+    ):
+        self.server_ids = list(server_configs)
+        self.examples_path = Path(examples_path) if examples_path else None
+        self.max_examples = max_examples
+        self.min_confidence = min_confidence
+        self.neighbour_threshold = neighbour_threshold
+        self.model = get_model_manager()
+        self.examples: List[dict] = []  # {"query", "servers", "vector"}
+        self.tool_owner: Dict[str, str] = {}     # full tool name → server id
+        self.keyword_owner: Dict[str, str] = {}  # distinctive word → server id
+        self.fast_hits = 0
+        self.fallbacks = 0
+        self._build_rules(server_configs)
+        self._load()
+
+    def _build_rules(self, server_configs: Dict[str, dict]):
+        tool_owners: Dict[str, set] = {}
+        word_owners: Dict[str, set] = {}
+        for server_id, config in server_configs.items():
+            for tool_name in config.get("capabilities", []) + config.get("basic_tools", []):
+                tool_owners.setdefault(tool_name.lower(), set()).add(server_id)
+                for word in _words(tool_name.replace("_", " ")):
+                    if len(word) >= MIN_KEYWORD_LENGTH and word not in GENERIC_WORDS:
+                        word_owners.setdefault(word, set()).add(server_id)
+        # A tool or word shared by several servers ("search", "results") says nothing about which one
+        self.tool_owner = {name: next(iter(ids)) for name, ids in tool_owners.items() if len(ids) == 1}
+        self.keyword_owner = {word: next(iter(ids)) for word, ids in word_owners.items() if len(ids) == 1}
+
+    def _load(self):
+        if self.examples_path and self.examples_path.exists():
+            try:
+                self.examples = json.loads(self.examples_path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError) as e:
+                log("router", f"⚠️ Ignoring unreadable examples {self.examples_path}: {e}")
+        # Drop examples that point at servers no longer configured
+        self.examples = [ex for ex in self.examples if set(ex["servers"]) <= set(self.server_ids)]
+
+    def _save(self):
+        if not self.examples_path:
+            return
+        self.examples_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.examples_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.examples), encoding="utf-8")
+        tmp.replace(self.examples_path)
+
+    def match_keywords(self, query: str) -> Tuple[List[str], float, Optional[str]]:
+        """Servers named by keyword rules, their confidence, and a tool hint if a tool was named."""
+        words = set(_words(query))
+        lowered = query.lower()
+        hits: Dict[str, int] = {}
+        tool_hint = None
+        for tool_name, server_id in self.tool_owner.items():
+            # Whole-word match, so "sin" does not fire on "using" nor "add" on "address"
+            if tool_name in words or ("_" in tool_name and tool_name in lowered):
+                hits[server_id] = hits.get(server_id, 0) + 2
+                tool_hint = tool_hint or tool_name
+        for word in words:
+            server_id = self.keyword_owner.get(word)
+            if server_id:
+                hits[server_id] = hits.get(server_id, 0) + 1
+        if not hits:
+            return [], 0.0, None
+        servers = sorted(hits, key=hits.get, reverse=True)
+        top = hits[servers[0]]
+        # Evidence for the leading server (1 hit → 0.5, 2 → 0.67, 3 → 0.75), scaled by its share:
+        # hits spread over several servers mean the rules cannot tell which one the query needs
+        share = top / sum(hits.values())
+        return servers, share * top / (top + 1), tool_hint
+
+    def nearest(self, query_vector: List[float]) -> Tuple[List[str], float]:
+        best, best_score = None, 0.0
+        for example in self.examples:
+            score = dot(query_vector, example["vector"])
+            if score > best_score:
+                best, best_score = example, score
+        return (list(best["servers"]), best_score) if best else ([], 0.0)
+
+    async def route(self, query: str) -> Optional[RouteDecision]:
+        keyword_servers, keyword_conf, tool_hint = self.match_keywords(query)
+        decision = None
+
+        neighbour_servers, neighbour_score = [], 0.0
+        if self.examples:
+            try:
+                query_vector = normalize(await self.model.embed(query))
+                neighbour_servers, neighbour_score = self.nearest(query_vector)
+            except Exception as e:
+                log("router", f"⚠️ Query embedding failed ({e}); keyword rules only")
+
+        if neighbour_score >= self.neighbour_threshold:
+            decision = RouteDecision(servers=neighbour_servers, confidence=neighbour_score, source="neighbour", tool_hint=tool_hint)
+        elif keyword_servers and neighbour_score >= AGREEMENT_FLOOR and set(keyword_servers) == set(neighbour_servers):
+            # Two independent signals agree: trust the combination even if each is weak
+            confidence = 1 - (1 - keyword_conf) * (1 - neighbour_score)
+            decision = RouteDecision(servers=keyword_servers, confidence=confidence, source="neighbour+keywords", tool_hint=tool_hint)
+        elif keyword_servers and tool_hint:
+            # Keywords alone only decide when the query names a tool outright
+            decision = RouteDecision(servers=keyword_servers, confidence=keyword_conf, source="keywords", tool_hint=tool_hint)
+
+        if decision and decision.confidence >= self.min_confidence:
+            self.fast_hits += 1
+            return decision
+        self.fallbacks += 1
+        return None
+
+    async def record(self, query: str, servers: List[str]):
+        """Remember a query whose servers led to a successful answer."""
+        if not servers or not set(servers) <= set(self.server_ids):
+            return
+        try:
+            vector = normalize(await self.model.embed(query))
+        except Exception as e:
+            log("router", f"⚠️ Could not embed example ({e}); not recorded")
+            return
+        self.examples = [ex for ex in self.examples if ex["query"] != query]
+        self.examples.append({"query": query, "servers": list(servers), "vector": vector})
+        del self.examples[:-self.max_examples]
+        self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        decisions = self.fast_hits + self.fallbacks
+        return {
+            "examples": len(self.examples),
+            "fast_path": self.fast_hits,
+            "llm_fallbacks": self.fallbacks,
+            "fast_path_rate": round(self.fast_hits / decisions, 3) if decisions else 0.0,
+        }
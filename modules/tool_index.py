@@ -0,0 +1,137 @@
+# modules/tool_index.py
+
+import json
+import math
+import asyncio
+import hashlib
+from pathlib import Path
+from collections import OrderedDict
+from typing import List, Optional, Any, Dict
+from modules.model_manager import get_model_manager
+from modules.tools import filter_tools_by_hint
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+DEFAULT_INDEX_PATH = "cache/tool_embeddings.json"
+DEFAULT_TOP_K = 6
+QUERY_CACHE_SIZE = 64
+
+
+def tool_text(tool: Any) -> str:
+    """What gets embedded for a tool: its name and docstring."""
+    return f"{tool.name}: {getattr(tool, 'description', None) or ''}".strip()
+
+
+def normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def dot(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+class ToolIndex:
+    """
+    Small in-memory vector index over MCP tools.
+    Each tool's name + docstring is embedded once (vectors persist in a JSON file keyed
+    by text hash, so restarts only embed new or changed tools) and queries return the
+    top-k tools by cosine similarity. If the embedding model is unreachable the index
+    degrades to the old behaviour: hint match, else every candidate tool.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_INDEX_PATH, top_k: int = DEFAULT_TOP_K):
+        self.path = Path(path) if path else None
+        self.top_k = top_k
+        self.model = get_model_manager()
+        self.vectors: Dict[str, List[float]] = {}  # text hash → unit vector
+        self.query_vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.available = True
+        self._load()
+
+    def _key(self, text: str) -> str:
+        payload = f"{self.model.embedding_model_key}\0{text}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if self.path and self.path.exists():
+            try:
+                self.vectors = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError) as e:
+                log("tools", f"⚠️ Ignoring unreadable tool index {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.vectors), encoding="utf-8")
+        tmp.replace(self.path)
+
+    async def build(self, tools: List[Any]):
+        """Embed every tool not already in the index (called once after discovery)."""
+        missing = {self._key(tool_text(tool)): tool_text(tool) for tool in tools}
+        missing = {key: text for key, text in missing.items() if key not in self.vectors}
+        if not missing:
+            log("tools", f"Tool index ready ({len(tools)} tools, all cached)")
+            return
+
+        results = await asyncio.gather(
+            *(self.model.embed(text) for text in missing.values()), return_exceptions=True
+        )
+        failures = [r for r in results if isinstance(r, Exception)]
+        for key, vector in zip(missing, results):
+            if not isinstance(vector, Exception):
+                self.vectors[key] = normalize(vector)
+        if failures:
+            self.available = False
+            log("tools", f"⚠️ Embedding failed for {len(failures)} tools ({failures[0]}); using hint matching")
+        self._save()
+        log("tools", f"Tool index ready ({len(tools)} tools, {len(missing) - len(failures)} embedded)")
+
+    async def _query_vector(self, query: str) -> List[float]:
+        if query in self.query_vectors:
+            self.query_vectors.move_to_end(query)
+            return self.query_vectors[query]
+        vector = normalize(await self.model.embed(query))
+        self.query_vectors[query] = vector
+        if len(self.query_vectors) > QUERY_CACHE_SIZE:
+            self.query_vectors.popitem(last=False)
+        return vector
+
+    async def search(self, query: str, tools: List[Any], hint: Optional[str] = None, k: Optional[int] = None) -> List[Any]:
+        """
+        Top-k of `tools` for the query, most similar first. A tool matching `hint` is
+        always kept. Returns `tools` unchanged when there is nothing to trim.
+        """
+        k = k or self.top_k
+        if not k or len(tools) <= k:
+            return tools
+        if not self.available:
+            return filter_tools_by_hint(tools, hint)
+
+        try:
+            query_vector = await self._query_vector(query)
+        except Exception as e:
+            log("tools", f"⚠️ Query embedding failed ({e}); using hint matching")
+            return filter_tools_by_hint(tools, hint)
+
+        hint_lower = (hint or "").lower()
+        scored = []
+        for tool in tools:
+            vector = self.vectors.get(self._key(tool_text(tool)))
+            score = dot(query_vector, vector) if vector else 0.0
+            pinned = bool(hint_lower) and hint_lower in tool.name.lower()
+            scored.append((pinned, score, tool))
+        scored.sort(key=lambda entry: (entry[0], entry[1]), reverse=True)
+
+        selected = [tool for _, _, tool in scored[:k]]
+        log("tools", f"Selected {len(selected)}/{len(tools)} tools: {[tool.name for tool in selected]}")
+        return selected
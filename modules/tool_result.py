@@ -0,0 +1,143 @@
+# modules/tool_result.py
+
+import json
+from typing import List, Optional, Any, Union
+
+LARGE_PAYLOAD_BYTES = 64 * 1024  # text blocks above this travel and rest as UTF-8 bytes until read
+
+
+class LazyText:
+    """
+    One text content block. Large payloads (markdown pages, search dumps) are held as a
+    memoryview over UTF-8 bytes and decoded to str only when `.text` is first read.
+    """
+
+    type = "text"
+
+    def __init__(self, payload: Union[str, bytes, memoryview], annotations: Any = None):
+        self._text: Optional[str] = payload if isinstance(payload, str) else None
+        self._raw: Optional[memoryview] = None if isinstance(payload, str) else memoryview(payload)
+        self.annotations = annotations
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = str(self._raw, "utf-8")
+            self._raw = None
+        return self._text
+
+    def __getitem__(self, key: str):
+        # Plans sometimes index results like dicts: result["content"][0]["text"]
+        return getattr(self, key)
+
+    def __len__(self) -> int:
+        return len(self._raw) if self._raw is not None else len(self._text)
+
+    def __getstate__(self):
+        # memoryviews do not pickle; send large payloads as bytes, the receiver re-wraps them
+        if self._raw is not None:
+            payload = self._raw.tobytes()
+        elif len(self._text) > LARGE_PAYLOAD_BYTES:
+            payload = self._text.encode("utf-8")
+        else:
+            payload = self._text
+        return {"payload": payload, "annotations": self.annotations}
+
+    def __setstate__(self, state):
+        self.__init__(state["payload"], state["annotations"])
+
+    def __str__(self):
+        # Same rendering as mcp's TextContent, so f"{block}" in a plan shows the decoded text
+        return f"type='text' text={self.text!r} annotations={self.annotations!r} meta=None"
+
+    def __format__(self, spec: str) -> str:
+        return format(str(self), spec)
+
+    def render(self) -> str:
+        """TextContent's repr, as it appears inside a rendered CallToolResult."""
+        return f"TextContent(type='text', text={self.text!r}, annotations={self.annotations!r}, meta=None)"
+
+    def __repr__(self):
+        # Debugging only: does not decode the payload
+        return f"<LazyText {len(self)} {'bytes' if self._raw is not None else 'chars'}>"
+
+
+class ToolResult:
+    """
+    What SandboxMCP.call_tool hands to a plan.
+
+    `.result` is the tool's "result" value, parsed once and cached; it comes straight from
+    `structuredContent` when the server sent it, so no JSON is parsed at all. The
+    CallToolResult shape is kept, so `json.loads(result.content[0].text)["result"]`
+    still works for plans written that way.
+    """
+
+    def __init__(self, content: List[Any], isError: bool = False, structuredContent: Optional[dict] = None):
+        self.content = content
+        self.isError = isError
+        self.structuredContent = structuredContent
+        self._data: Any = None
+        self._parsed = False
+
+    @classmethod
+    def from_call_result(cls, result: Any) -> "ToolResult":
+        if isinstance(result, ToolResult):
+            return result
+        content = [
+            LazyText(block.text, getattr(block, "annotations", None)) if getattr(block, "type", None) == "text" else block
+            for block in getattr(result, "content", None) or []
+        ]
+        return cls(
+            content=content,
+            isError=bool(getattr(result, "isError", False)),
+            structuredContent=getattr(result, "structuredContent", None),
+        )
+
+    @property
+    def text(self) -> str:
+        """The first text block (empty string when the tool returned none)."""
+        return next((block.text for block in self.content if getattr(block, "type", None) == "text"), "")
+
+    @property
+    def data(self) -> Any:
+        """The whole JSON payload: structuredContent if present, else the parsed first text block."""
+        if not self._parsed:
+            if self.structuredContent is not None:
+                self._data = self.structuredContent
+            else:
+                text = self.text
+                try:
+                    self._data = json.loads(text)
+                except ValueError:
+                    self._data = text  # plain-text tools: the text is the result
+            self._parsed = True
+        return self._data
+
+    @property
+    def result(self) -> Any:
+        data = self.data
+        if isinstance(data, dict) and "result" in data:
+            return data["result"]
+        return data
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def __getstate__(self):
+        return {"content": self.content, "isError": self.isError, "structuredContent": self.structuredContent}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __str__(self):
+        # Plans pass raw results on (f"FURTHER_PROCESSING_REQUIRED: {result}"); render them exactly
+        # as CallToolResult did, decoded text included, so the next step sees the content
+        content = ", ".join(block.render() if isinstance(block, LazyText) else repr(block) for block in self.content)
+        return f"meta=None content=[{content}] structuredContent={self.structuredContent!r} isError={self.isError}"
+
+    def __format__(self, spec: str) -> str:
+        return format(str(self), spec)
+
+    def __repr__(self):
+        # Debugging only: does not decode the payload
+        return f"<ToolResult isError={self.isError} content={self.content!r}>"
@@ -1,6 +1,10 @@
 # modules/tools.py
 
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
+from functools import lru_cache
+from pathlib import Path
+from string import Formatter
+from core.config import registry
 import re
 
 # Currently used in perception.py
@@ -34,17 +38,23 @@ def summarize_tools(tools: List[Any]) -> str:
     """
     Generate a string summary of tools for LLM prompt injection.
     Format: "- tool_name: description"
+    Memoized on the (name, description) pairs, so the same tool set is rendered once.
     """
-    return "\n".join(
-        f"- {tool.name}: {getattr(tool, 'description', 'No description provided.')}"
+    return _render_tool_summary(tuple(
+        (tool.name, getattr(tool, 'description', 'No description provided.'))
         for tool in tools
-    )
+    ))
+
+
+@lru_cache(maxsize=128)
+def _render_tool_summary(entries: Tuple[Tuple[str, str], ...]) -> str:
+    return "\n".join(f"- {name}: {description}" for name, description in entries)
     # Example output:
     # - search_documents: A tool to search through documents.
     # - calculate_sum: A tool to calculate the sum of numbers.
     # - fetch_data: A tool to fetch data from an API.
 
-# Currently not used
+# Fallback for tool_index.py when embeddings are unavailable
 def filter_tools_by_hint(tools: List[Any], hint: Optional[str] = None) -> List[Any]:
     """
     If tool_hint is provided (e.g., 'search_documents'),
@@ -74,5 +84,25 @@ def tool_expects_input(self, tool_name: str) -> bool:
 
 # Used wherever prompts are loaded - perception.py, decision.py, etc.
 def load_prompt(path: str) -> str:
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
+    """
+    Prompt template text, read and validated once and re-read only when the file changes
+    (shared registry in core/config.py).
+    """
+    return registry.load(Path(path), _parse_prompt)
+
+
+def _parse_prompt(text: str) -> str:
+    # Fails at load time on unbalanced braces instead of at .format() in the middle of a step
+    list(Formatter().parse(text))
+    return text
+
+
+def preload_prompts(directory: str = "prompts") -> Dict[str, str]:
+    """Load and validate every prompts/*.txt up front; raises on a malformed template."""
+    templates = {}
+    for path in sorted(Path(directory).glob("*.txt")):
+        try:
+            templates[path.name] = load_prompt(str(path))
+        except ValueError as e:
+            raise ValueError(f"Invalid prompt template {path}: {e}") from e
+    return templates
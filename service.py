@@ -0,0 +1,247 @@
+# service.py
+
+import sys
+import json
+import uuid
+import asyncio
+import argparse
+from typing import Optional, Any, Dict, Callable
+from core.config import get_profile
+from core.limits import ConcurrencyLimiter, QueueFullError
+from core.runtime import AgentRuntime, read_in_thread
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+Emit = Callable[[Dict[str, Any]], None]
+
+
+class AgentService:
+    """
+    Runs many agent sessions at once on one AgentRuntime (one set of MCP servers, one
+    sandbox pool). Up to `max_sessions` AgentLoops run concurrently, up to `max_queue`
+    more wait for a slot, and anything beyond that is rejected straight away.
+
+    A request is {"query": ..., "id": optional, "session_id": optional}; passing an
+    earlier session_id continues that session's memory. Every event sent back carries
+    the request id: accepted, started, the loop's progress events (perception, plan,
+    result, retry, ...), then exactly one of done, rejected or error.
+    """
+
+    def __init__(self, runtime: AgentRuntime, max_sessions: int = 8, max_queue: Optional[int] = 32):
+        self.runtime = runtime
+        self.sessions = ConcurrencyLimiter("sessions", max_sessions, max_queue)
+        self.completed = 0
+        self.failed = 0
+
+    async def run_task(self, request: Dict[str, Any], emit: Emit):
+        task_id = str(request.get("id") or uuid.uuid4().hex[:8])
+
+        def send(event: Dict[str, Any]):
+            emit({"id": task_id, **event})
+
+        query = request.get("query")
+        if not isinstance(query, str) or not query.strip():
+            send({"event": "error", "error": "request needs a non-empty 'query'"})
+            return
+
+        send({"event": "accepted", "queued": self.sessions.waiting})
+        try:
+            async with self.sessions.slot():
+                send({"event": "started"})
+                result = await self.runtime.solve(query, request.get("session_id"), on_progress=send)
+        except QueueFullError as e:
+            send({"event": "rejected", "error": str(e)})
+            return
+        except Exception as e:
+            self.failed += 1
+            log("service", f"⚠️ Task {task_id} failed: {e}")
+            send({"event": "error", "error": str(e)})
+            return
+        self.completed += 1
+        send({"event": "done", **result})
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sessions": self.sessions.stats(), "completed": self.completed, "failed": self.failed}
+
+
+def parse_request(line: str, emit: Emit) -> Optional[Dict[str, Any]]:
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        emit({"event": "error", "error": f"invalid JSON: {e}"})
+        return None
+    if not isinstance(request, dict):
+        emit({"event": "error", "error": "request must be a JSON object"})
+        return None
+    return request
+
+
+def encode(event: Dict[str, Any]) -> bytes:
+    return (json.dumps(event, default=str) + "\n").encode("utf-8")
+
+
+def writer_emit(writer: asyncio.StreamWriter) -> Emit:
+    def emit(event: Dict[str, Any]):
+        if not writer.is_closing():
+            writer.write(encode(event))
+    return emit
+
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+
+async def serve_stdio(service: AgentService):
+    """JSON-lines requests on stdin, JSON-lines events on stdout; agent logs go to stderr."""
+    out = sys.stdout
+    sys.stdout = sys.stderr  # keep print()/log() output from interleaving with protocol lines
+
+    def emit(event: Dict[str, Any]):
+        out.write(encode(event).decode("utf-8"))
+        out.flush()
+
+    tasks = set()
+    while True:
+        line = await read_in_thread(sys.stdin.readline)
+        if not line:
+            break  # EOF: finish what was accepted, then exit
+        if not line.strip():
+            continue
+        request = parse_request(line, emit)
+        if request is not None:
+            task = asyncio.create_task(service.run_task(request, emit))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def handle_stream(service: AgentService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """One socket client: JSON-lines both ways, any number of requests in flight per connection."""
+    emit = writer_emit(writer)
+    tasks = set()
+    try:
+        while line := await reader.readline():
+            if not line.strip():
+                continue
+            request = parse_request(line.decode("utf-8", errors="replace"), emit)
+            if request is not None:
+                task = asyncio.create_task(service.run_task(request, emit))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await writer.drain()
+        if tasks:
+            await asyncio.gather(*tasks)
+        await writer.drain()
+    except ConnectionError:
+        pass  # sessions already running finish; their events are dropped
+    finally:
+        writer.close()
+
+
+async def handle_http(service: AgentService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Minimal HTTP/1.1: POST /tasks with a JSON request body streams the session's events
+    back as NDJSON until it finishes; GET /stats returns service and runtime stats.
+    """
+    def respond(status: str, content_type: str, body: bytes = b"", streaming: bool = False):
+        headers = [f"HTTP/1.1 {status}", f"Content-Type: {content_type}", "Connection: close"]
+        if streaming:
+            headers.append("Cache-Control: no-cache")
+        else:
+            headers.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+
+    try:
+        try:
+            method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+        except (ValueError, asyncio.IncompleteReadError):
+            respond("400 Bad Request", "text/plain", b"malformed request\n")
+            return
+
+        if path == "/tasks" and method == "POST":
+            request = parse_request(body.decode("utf-8", errors="replace"), lambda event: None)
+            if request is None:
+                respond("400 Bad Request", "text/plain", b"body must be a JSON object\n")
+                return
+            respond("200 OK", "application/x-ndjson", streaming=True)
+            await service.run_task(request, writer_emit(writer))
+        elif path == "/stats" and method == "GET":
+            stats = {"service": service.stats(), "runtime": service.runtime.stats()}
+            respond("200 OK", "application/json", encode(stats))
+        elif path in ("/tasks", "/stats"):
+            respond("405 Method Not Allowed", "text/plain", b"method not allowed\n")
+        else:
+            respond("404 Not Found", "text/plain", b"not found\n")
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def parse_address(value: str, default_host: str) -> tuple:
+    host, _, port = value.rpartition(":")
+    return host or default_host, int(port)
+
+
+async def main():
+    profile = get_profile()
+    config = profile.get("service") or {}
+    default_address = f"{config.get('host', '127.0.0.1')}:{config.get('port', 8765)}"
+
+    parser = argparse.ArgumentParser(description="Serve agent sessions concurrently.")
+    transport = parser.add_mutually_exclusive_group()
+    transport.add_argument("--stdio", action="store_true", help="JSON-lines requests on stdin, events on stdout")
+    transport.add_argument("--socket", metavar="PATH", help="JSON-lines over a Unix domain socket")
+    transport.add_argument("--tcp", nargs="?", const=default_address, metavar="[HOST:]PORT", help="JSON-lines over TCP")
+    transport.add_argument("--http", nargs="?", const=default_address, metavar="[HOST:]PORT", help="HTTP (default)")
+    args = parser.parse_args()
+
+    runtime = AgentRuntime(profile)
+    await runtime.start()
+    service = AgentService(
+        runtime,
+        max_sessions=config.get("max_sessions", 8),
+        max_queue=config.get("max_queue", 32),
+    )
+
+    try:
+        if args.stdio:
+            log("service", "Reading JSON-lines tasks from stdin")
+            await serve_stdio(service)
+            return
+        if args.socket:
+            server = await asyncio.start_unix_server(lambda r, w: handle_stream(service, r, w), path=args.socket)
+            where = f"unix:{args.socket}"
+        elif args.tcp:
+            host, port = parse_address(args.tcp, config.get("host", "127.0.0.1"))
+            server = await asyncio.start_server(lambda r, w: handle_stream(service, r, w), host, port)
+            where = f"tcp://{host}:{port}"
+        else:
+            host, port = parse_address(args.http or default_address, config.get("host", "127.0.0.1"))
+            server = await asyncio.start_server(lambda r, w: handle_http(service, r, w), host, port)
+            where = f"http://{host}:{port}/tasks"
+        log("service", f"🧠 Serving agent sessions on {where} (max {service.sessions.max_concurrency} at once)")
+        async with server:
+            await server.serve_forever()
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        log("service", "👋 Received exit signal. Shutting down...")
+    finally:
+        log("service", f"Service stats: {service.stats()}")
+        await runtime.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())